@@ -0,0 +1,381 @@
+import sys
+import os
+import time
+import math
+import random
+import tempfile
+import json
+import fnmatch
+import argparse
+import platform
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtGui import QImage, QPainter
+from PyQt6.QtCore import QRectF, QPointF, QPoint, Qt, QT_VERSION_STR
+from PyQt6.QtTest import QTest
+
+import mindmap
+import mapformat
+import mapgraph
+import mapworkspace
+
+GRID = mindmap.GRID_SIZE
+
+def best_of(fn, runs=5):
+    times = []
+    for _ in range(runs):
+        t = time.perf_counter(); fn(); times.append(time.perf_counter() - t)
+    return min(times) * 1000
+
+def bench_zoomed_out_frame(win):
+    # Whole 10000x10000 scene into a 1500px viewport, i.e. the 0.15 minimum zoom
+    img = QImage(1500, 1500, QImage.Format.Format_ARGB32)
+    def frame():
+        p = QPainter(img); p.setRenderHint(QPainter.RenderHint.Antialiasing)
+        win.scene.render(p, QRectF(0, 0, 1500, 1500), QRectF(0, 0, 10000, 10000)); p.end()
+    return best_of(frame)
+
+def populate(scene, data):
+    # A synthetic map with every block and line materialized
+    scene.attach_store(mapformat.BlockStore.from_dict(data)); scene.materialize_all()
+
+def bench_pan_frame(win, blocks=5000, edges=20000, frames=10):
+    # 1920x1080 viewport at 1:1 stepped diagonally across a random map with many edges
+    populate(win.scene, synthetic_map("random", blocks, edges))
+    img = QImage(1920, 1080, QImage.Format.Format_ARGB32); offsets = iter(range(frames + 1))
+    def frame():
+        i = next(offsets) * 400; p = QPainter(img); p.setRenderHint(QPainter.RenderHint.Antialiasing)
+        win.scene.render(p, QRectF(0, 0, 1920, 1080), QRectF(i, i, 1920, 1080)); p.end()
+    frame()
+    return sum(best_of(frame, 1) for _ in range(frames)) / frames
+
+def bench_overview_frame(win, blocks=5000, edges=5000):
+    # Zoomed-out repaint of a populated map, with the text detail the view would apply at 0.15
+    populate(win.scene, synthetic_map("random", blocks, edges)); win.scene.set_detail(0.15)
+    return bench_zoomed_out_frame(win)
+
+def bench_hub_drag(win, spokes=500, steps=50, moves_per_tick=4):
+    # Mean cost of one event-loop tick while dragging a hub with `spokes` edges; a fast mouse delivers several moves per tick
+    app, scene = QApplication.instance(), win.scene
+    hub = scene.add_block(mindmap.MindBlock(5000, 5000, scene))
+    for i in range(spokes):
+        a = 2 * math.pi * i / spokes
+        b = scene.add_block(mindmap.MindBlock(5000 + 2000 * math.cos(a), 5000 + 2000 * math.sin(a), scene))
+        scene.add_connection(hub, b)
+    win.show(); app.processEvents()
+    t = time.perf_counter()
+    for i in range(steps):
+        for _ in range(moves_per_tick): hub.setPos(hub.pos() + QPointF(GRID, GRID))
+        app.processEvents()
+    ms = (time.perf_counter() - t) * 1000 / steps
+    win.hide(); return ms
+
+def bench_resize_drag(win, steps=60, moves_per_tick=4):
+    # CPU per event-loop tick while resize-dragging a block of long wrapped text; mouse moves arrive every 4 ms
+    app, scene = QApplication.instance(), win.scene
+    b = scene.add_block(mindmap.MindBlock(100, 100, scene, text=" ".join(["lorem ipsum dolor sit amet"] * 80)))
+    win.show(); app.processEvents()
+    t = time.process_time()
+    for k in range(steps):
+        for j in range(moves_per_tick): b.resize_to(200 + k * 5 + j, 100 + k * 3 + j)
+        app.processEvents(); time.sleep(0.004)
+    scene.flush_relayout(); ms = (time.process_time() - t) * 1000 / steps
+    win.hide(); return ms
+
+def bench_delete_dense_hub(win, k=150):
+    # Delete a hub whose k parents already link to all of its k children, so auto-heal only has to find existing edges
+    scene = win.scene; hub = scene.add_block(mindmap.MindBlock(5000, 5000, scene))
+    ins = [scene.add_block(mindmap.MindBlock(100 + 60 * i, 4000, scene)) for i in range(k)]
+    outs = [scene.add_block(mindmap.MindBlock(100 + 60 * i, 6000, scene)) for i in range(k)]
+    for a in ins:
+        scene.add_connection(a, hub, directed=True)
+        for b in outs: scene.add_connection(a, b, directed=True)
+    for b in outs: scene.add_connection(hub, b, directed=True)
+    t = time.perf_counter(); scene.delete_block(hub)
+    return (time.perf_counter() - t) * 1000
+
+def bench_graph_bulk_delete(win, blocks=100000, edges=300000, deleted=10000, seed=3):
+    # Graph model only, no Qt items: bulk delete with auto-heal on a large random map
+    rnd = random.Random(seed); g = mapgraph.MapGraph()
+    for _ in range(edges):
+        a, b = rnd.randrange(blocks), rnd.randrange(blocks)
+        if a != b: g.add_edge(a, b)
+    gone = rnd.sample(range(blocks), deleted)
+    t = time.perf_counter(); pairs = g.heal_pairs(gone); g.remove_nodes(gone); g.add_edges((a, b, True) for a, b in pairs)
+    return (time.perf_counter() - t) * 1000
+
+def bench_force_layout(win, blocks=10000, seed=4):
+    # Layout model only, no Qt items: force-directed layout of a random tree-ish map, sizes as in the editor
+    import numpy as np, maplayout
+    rnd = random.Random(seed); pos = np.array([(rnd.uniform(0, 9800), rnd.uniform(0, 9900)) for _ in range(blocks)])
+    edges = [(i, rnd.randrange(i)) for i in range(1, blocks)] + [tuple(rnd.sample(range(blocks), 2)) for _ in range(blocks // 5)]
+    t = time.perf_counter(); maplayout.force_layout(pos, np.full((blocks, 2), (190.0, 40.0)), edges)
+    return (time.perf_counter() - t) * 1000
+
+def bench_search(win, blocks=50000):
+    # Mean query time on a loaded map, after the first query has built the index; prefix, multi-word and typo queries
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "bench.mapb"); mapformat.save(path, synthetic_map("random", blocks)); win.load_from_path(path, journal=False)
+    win.scene.search("idea"); queries = ["ide", "idea 4242", "idae 1234", "4242", "idea 4", "zzz"]
+    return sum(best_of(lambda: win.scene.search(q)) for q in queries) / len(queries)
+
+def bench_workspace_reindex(win, maps=40, blocks=2000):
+    # Re-crawl of a tree of linked maps after one leaf changed: only that map is parsed again
+    with tempfile.TemporaryDirectory() as d:
+        paths = [os.path.join(d, f"m{i}.mapb") for i in range(maps)]
+        for i, path in enumerate(paths):
+            data = synthetic_map("random", blocks, seed=i)
+            for k, child in enumerate(paths[2 * i + 1:2 * i + 3]): data["blocks"][k]["f_path"] = child
+            mapformat.save(path, data)
+        ix = mapworkspace.WorkspaceIndex(os.path.join(d, "index.json")); ix.crawl(paths[0]); ix.save()
+        time.sleep(0.01); mapformat.save(paths[-1], mapformat.load(paths[-1]))
+        t = time.perf_counter(); mapworkspace.WorkspaceIndex(ix.path).crawl(paths[0])
+        return (time.perf_counter() - t) * 1000
+
+# Synthetic maps: each generator returns block positions and (from, to) index pairs for a given block count
+AREA = 60000  # scene px² per block, about 1.6 block footprints of room around each one
+HUB_SPOKES = 500
+
+def side_for(blocks): return (blocks * AREA) ** 0.5
+
+def fill_edges(pairs, edges, blocks, rnd):
+    # Trims the generator's own edges to the requested count, or tops them up with random pairs
+    pairs = pairs[:edges]
+    while len(pairs) < edges and blocks > 1: pairs.append(tuple(rnd.sample(range(blocks), 2)))
+    return pairs
+
+def gen_random(blocks, edges, rnd):
+    side = side_for(blocks); pos = [(rnd.uniform(0, side), rnd.uniform(0, side)) for _ in range(blocks)]
+    return pos, fill_edges([], blocks if edges is None else edges, blocks, rnd)
+
+def gen_tree(blocks, edges, rnd, branch=4):
+    # Complete tree laid out as a slice-and-dice treemap: a block takes a slice of its region and its children split
+    # the rest in proportion to their subtree sizes, so every subtree is a compact patch of the map
+    size = [1] * blocks
+    for i in range(blocks - 1, 0, -1): size[(i - 1) // branch] += size[i]
+    pos, side = [None] * blocks, side_for(blocks); stack = [(0, 0.0, 0.0, side, side)]
+    while stack:
+        i, x, y, w, h = stack.pop(); pos[i] = (x, y); wide = w >= h
+        cut = (w if wide else h) / size[i]; x, y = (x + cut, y) if wide else (x, y + cut)
+        rest = (w if wide else h) - cut
+        for c in range(branch * i + 1, min(blocks, branch * i + branch + 1)):
+            span = rest * size[c] / (size[i] - 1)
+            stack.append((c, x, y, span, h) if wide else (c, x, y, w, span))
+            x, y = (x + span, y) if wide else (x, y + span)
+    pairs = [((i - 1) // branch, i) for i in range(1, blocks)]
+    return pos, fill_edges(pairs, blocks - 1 if edges is None else edges, blocks, rnd)
+
+def gen_hub(blocks, edges, rnd):
+    # One hub per HUB_SPOKES blocks on a grid, its spokes on a sunflower spiral around it; hubs point at their spokes
+    # and at the next hub, so deleting a hub heals its spokes onto the previous one
+    hubs = max(1, blocks // HUB_SPOKES); cols = math.ceil(hubs ** 0.5); per = math.ceil((blocks - hubs) / hubs)
+    c = (AREA / math.pi) ** 0.5; cell = 2 * (300 + c * per ** 0.5)
+    pos, pairs = [((h % cols) * cell + cell / 2, (h // cols) * cell + cell / 2) for h in range(hubs)], []
+    for h in range(1, hubs): pairs.append((h - 1, h))
+    for i in range(hubs, blocks):
+        h, j = (i - hubs) % hubs, (i - hubs) // hubs; r, a = 300 + c * j ** 0.5, j * math.pi * (3 - 5 ** 0.5)
+        pos.append((pos[h][0] + r * math.cos(a), pos[h][1] + r * math.sin(a))); pairs.append((h, i))
+    return pos, fill_edges(pairs, len(pairs) if edges is None else edges, blocks, rnd)
+
+def gen_grid(blocks, edges, rnd):
+    # Blocks packed in rows 50 px apart, each linked to its right and lower neighbours
+    cols = math.ceil(blocks ** 0.5); pos = [((i % cols) * 240, (i // cols) * 90) for i in range(blocks)]
+    pairs = [(i, i + 1) for i in range(blocks - 1) if (i + 1) % cols] + [(i, i + cols) for i in range(blocks - cols)]
+    pairs.sort(key=lambda p: p[0])
+    return pos, fill_edges(pairs, len(pairs) if edges is None else edges, blocks, rnd)
+
+GENERATORS = {"random": gen_random, "tree": gen_tree, "hub": gen_hub, "grid": gen_grid}
+
+def synthetic_map(kind, blocks, edges=None, seed=2):
+    # A map dict in the .map schema; edges defaults to what the shape implies (n-1 for a tree, 2 per grid block, ...)
+    rnd = random.Random(seed); pos, pairs = GENERATORS[kind](blocks, edges, rnd)
+    bs = [{"x": round(x / GRID) * GRID, "y": round(y / GRID) * GRID, "txt": f"Idea {i}", "bc": "#4a90e2", "tc": "#ffffff",
+           "ha": 1, "va": 1, "id": str(1000000 + i), "w": 190, "h": 40, "f_path": ""} for i, (x, y) in enumerate(pos)]
+    lines = [{"b1": bs[a]["id"], "b2": bs[b]["id"], "c": "#aaaaaa", "s": 1, "dir": True} for a, b in pairs]
+    return {"bg": "#2b2b2b", "blocks": bs, "lines": lines}
+
+def bench_load(win, blocks=50000, ext=".map", kind="random"):
+    # Open a map and paint the first 1920x1080 frame
+    app = QApplication.instance()
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "bench" + ext)
+        mapformat.save(path, synthetic_map(kind, blocks))
+        win.resize(1920, 1080); win.show(); app.processEvents()
+        t = time.perf_counter(); win.load_from_path(path); app.processEvents()
+        ms = (time.perf_counter() - t) * 1000
+    win.hide(); return ms
+
+def open_items(win, items):
+    # A random map of `items` blocks and lines, all materialized, in a 1920x1080 window at 1:1 over the middle of the
+    # map. Random lines are long: at one per block they cover every pixel of that view, so there is one per four blocks
+    app, scene = QApplication.instance(), win.scene
+    win.resize(1920, 1080); win.show(); app.processEvents()
+    scene.attach_store(mapformat.BlockStore.from_dict(synthetic_map("random", items * 4 // 5, items // 5))); scene.materialize_all()
+    win.view.centerOn(scene.content_rect().center()); app.processEvents()
+    return app, scene, win.view.viewport()
+
+def blank_points(win, n, rnd, w, h, tries=50):
+    # n viewport points within w x h of its top-left corner with nothing under them; a press there cannot open an editor
+    pts = []
+    for _ in range(n * tries):
+        if len(pts) == n: return pts
+        pt = QPoint(rnd.randrange(w), rnd.randrange(h))
+        if win.view.itemAt(pt) is None: pts.append(pt)
+    if len(pts) < n: raise RuntimeError(f"found {len(pts)} of {n} blank points in the view")
+    return pts
+
+def bench_click(win, items, clicks=20):
+    # Mean press/release/repaint on a block (shift+click toggles its selection) or on blank canvas
+    app, scene, vp = open_items(win, items); rnd = random.Random(5)
+    visible = [b for b in scene.items(win.view.mapToScene(vp.rect()).boundingRect()) if isinstance(b, mindmap.MindBlock)]
+    targets = [(win.view.mapFromScene(b.sceneBoundingRect().center()), Qt.KeyboardModifier.ShiftModifier) for b in rnd.sample(visible, clicks // 2)]
+    targets += [(pt, Qt.KeyboardModifier.NoModifier) for pt in blank_points(win, clicks - len(targets), rnd, vp.width(), vp.height())]
+    t = time.perf_counter()
+    for pt, mod in targets: QTest.mouseClick(vp, Qt.MouseButton.LeftButton, mod, pt); app.processEvents()
+    ms = (time.perf_counter() - t) * 1000 / clicks
+    win.hide(); return ms
+
+def bench_rubber_band(win, items, drags=5):
+    # Shift-drag from a blank point across half the viewport, selecting every block inside
+    app, scene, vp = open_items(win, items); rnd = random.Random(6); times = []
+    for start in blank_points(win, drags, rnd, vp.width() // 2, vp.height() // 2):
+        end = start + QPoint(vp.width() // 2, vp.height() // 2)
+        t = time.perf_counter()
+        QTest.mousePress(vp, Qt.MouseButton.LeftButton, Qt.KeyboardModifier.ShiftModifier, start)
+        QTest.mouseMove(vp, end); QTest.mouseRelease(vp, Qt.MouseButton.LeftButton, Qt.KeyboardModifier.ShiftModifier, end); app.processEvents()
+        times.append(time.perf_counter() - t); scene.clear_manual_selection()
+    win.hide(); return sum(times) * 1000 / drags
+
+def open_map(win, data, d, shown=True):
+    # Writes data to a .map in d and opens it the way File > Open does
+    app, path = QApplication.instance(), os.path.join(d, "bench.map"); mapformat.save(path, data)
+    if shown: win.resize(1920, 1080); win.show(); app.processEvents()
+    win.load_from_path(path, journal=False); app.processEvents()
+    return app, win.scene
+
+def bench_save(win, kind, blocks):
+    # do_save on a freshly opened map until the snapshot is on disk
+    with tempfile.TemporaryDirectory() as d:
+        open_map(win, synthetic_map(kind, blocks), d, False); out = os.path.join(d, "saved.map")
+        t = time.perf_counter(); win.do_save(out); win.open_journal(None)
+        return (time.perf_counter() - t) * 1000
+
+def bench_render_full(win, kind, blocks, size=2048):
+    # The whole map rendered into one image, the longer side `size` px, at the detail the view would use
+    with tempfile.TemporaryDirectory() as d: _, scene = open_map(win, synthetic_map(kind, blocks), d, False)
+    src = scene.content_rect(); scale = size / max(src.width(), src.height()); scene.materialize_rect(src); scene.set_detail(scale)
+    img = QImage(math.ceil(src.width() * scale), math.ceil(src.height() * scale), QImage.Format.Format_ARGB32)
+    def frame():
+        p = QPainter(img); p.setRenderHint(QPainter.RenderHint.Antialiasing); scene.render(p, QRectF(img.rect()), src); p.end()
+    return best_of(frame, 3)
+
+def bench_export_png(win, kind, blocks, scale=0.25):
+    # The tiled PNG export behind File > Export As PNG
+    with tempfile.TemporaryDirectory() as d:
+        _, scene = open_map(win, synthetic_map(kind, blocks), d, False)
+        t = time.perf_counter(); mindmap.export_tiled(scene, os.path.join(d, "out.png"), scale)
+        return (time.perf_counter() - t) * 1000
+
+def bench_zoom_out(win, kind, blocks):
+    # Viewport repaint of a 1920x1080 window zoomed out to the 0.15 minimum over the middle of the map
+    with tempfile.TemporaryDirectory() as d: app, scene = open_map(win, synthetic_map(kind, blocks), d)
+    view = win.view; view.resetTransform(); view.scale(0.15, 0.15); scene.set_detail(0.15)
+    view.centerOn(scene.content_rect().center()); view.sync_visible(); app.processEvents()
+    ms = best_of(view.viewport().repaint); win.hide(); return ms
+
+def bench_group_drag(win, blocks=10000, selected=1000, steps=20, moves_per_tick=4):
+    # One block of a manual selection dragged through MindBlock.itemChange, which moves the rest of the selection with it
+    with tempfile.TemporaryDirectory() as d: app, scene = open_map(win, synthetic_map("grid", blocks), d)
+    scene.materialize_all(); group = [scene.blocks[str(1000000 + i)] for i in range(selected)]
+    scene.set_manual_selection(group); app.processEvents()
+    t = time.perf_counter()
+    for _ in range(steps):
+        for _ in range(moves_per_tick): group[0].setPos(group[0].pos() + QPointF(GRID, GRID))
+        app.processEvents()
+    scene.end_drag(); ms = (time.perf_counter() - t) * 1000 / steps
+    win.hide(); return ms
+
+def bench_delete_hub(win, blocks=10000):
+    # Delete the middle hub of a hub-and-spoke map; auto-heal links the previous hub to all its spokes
+    with tempfile.TemporaryDirectory() as d: _, scene = open_map(win, synthetic_map("hub", blocks), d, False)
+    hub = scene.block_by_uid(str(1000000 + max(1, blocks // HUB_SPOKES) // 2))
+    t = time.perf_counter(); scene.delete_block(hub)
+    return (time.perf_counter() - t) * 1000
+
+def bench_import_folder(win, folders=50, files=100):
+    # Longest event-loop iteration while a folder tree is imported in the background, i.e. the worst stall the user sees
+    app = QApplication.instance(); win.resize(1920, 1080); win.show(); app.processEvents()
+    with tempfile.TemporaryDirectory() as d:
+        for i in range(folders):
+            os.makedirs(os.path.join(d, f"folder {i}"))
+            for k in range(files): open(os.path.join(d, f"folder {i}", f"note {k}.txt"), "w").close()
+        win.import_paths([d]); worst = 0
+        while win.imports:
+            t = time.perf_counter(); app.processEvents(); worst = max(worst, time.perf_counter() - t)
+    win.hide(); return worst * 1000
+
+SIZES = {"1k": 1000, "10k": 10000, "100k": 100000}
+
+SCENARIOS = {"zoomed_out_frame": bench_zoomed_out_frame, "overview_frame_5k": bench_overview_frame, "pan_frame_20k_edges": bench_pan_frame, "hub_drag_500": bench_hub_drag,
+             "resize_long_text": bench_resize_drag, "delete_dense_hub_150": bench_delete_dense_hub, "graph_bulk_delete_10k": bench_graph_bulk_delete,
+             "force_layout_10k": bench_force_layout, "search_50k": bench_search, "workspace_reindex_40_maps": bench_workspace_reindex,
+             "load_50k_json": bench_load, "load_50k_binary": lambda win: bench_load(win, ext=".mapb"),
+             **{f"click_{k}": lambda win, n=n: bench_click(win, n) for k, n in SIZES.items()},
+             **{f"rubber_band_{k}": lambda win, n=n: bench_rubber_band(win, n) for k, n in SIZES.items()},
+             **{f"load_{k}": lambda win, n=n: bench_load(win, n // 2) for k, n in SIZES.items()},
+             **{f"load_{g}_10k": lambda win, g=g: bench_load(win, 10000, kind=g) for g in GENERATORS},
+             **{f"save_{g}_10k": lambda win, g=g: bench_save(win, g, 10000) for g in GENERATORS},
+             **{f"render_full_{g}_10k": lambda win, g=g: bench_render_full(win, g, 10000) for g in GENERATORS},
+             **{f"export_png_{g}_10k": lambda win, g=g: bench_export_png(win, g, 10000) for g in GENERATORS},
+             **{f"zoom_out_{g}_10k": lambda win, g=g: bench_zoom_out(win, g, 10000) for g in GENERATORS},
+             "group_drag_1k_of_10k": bench_group_drag, "delete_hub_10k": bench_delete_hub,
+             "import_folder_5k_worst_tick": bench_import_folder}
+
+def compare(results, baseline, tolerance):
+    # Prints each scenario against the baseline and returns the names that got slower by more than tolerance
+    slower = []
+    for name, ms in results.items():
+        old = baseline.get(name)
+        if old is None: print(f"{name:32} {ms:10.2f} ms   (new)"); continue
+        change = ms / old - 1 if old else 0.0; flag = "  SLOWER" if change > tolerance else ""
+        if flag: slower.append(name)
+        print(f"{name:32} {ms:10.2f} ms   was {old:10.2f} ms  {change:+7.1%}{flag}")
+    return slower
+
+def main(argv):
+    ap = argparse.ArgumentParser(prog="bench.py", description="Headless benchmarks; every result is in milliseconds, lower is better.")
+    ap.add_argument("scenarios", nargs="*", help="scenario names or glob patterns (default: all)")
+    ap.add_argument("--list", action="store_true", help="list the scenarios and exit")
+    ap.add_argument("--json", metavar="OUT", help="write the results as JSON")
+    ap.add_argument("--compare", metavar="BASELINE", help="compare with a JSON file written by --json; exits 1 on a regression")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="slowdown allowed before --compare fails (default 0.15)")
+    ap.add_argument("--generate", nargs=2, metavar=("KIND", "OUT_MAP"), help=f"write a synthetic map and exit; KIND is one of {', '.join(GENERATORS)}")
+    ap.add_argument("--blocks", type=int, default=10000)
+    ap.add_argument("--edges", type=int, default=None)
+    ap.add_argument("--seed", type=int, default=2)
+    args = ap.parse_args(argv)
+    if args.list: print("\n".join(SCENARIOS)); return 0
+    if args.generate:
+        kind, out = args.generate
+        if kind not in GENERATORS: ap.error(f"unknown map kind {kind!r}")
+        data = synthetic_map(kind, args.blocks, args.edges, args.seed); mapformat.save(out, data)
+        print(f"Wrote {len(data['blocks'])} blocks and {len(data['lines'])} lines to {out}"); return 0
+    names = [n for n in SCENARIOS if not args.scenarios or any(fnmatch.fnmatchcase(n, p) for p in args.scenarios)]
+    if not names: ap.error("no scenario matches " + " ".join(args.scenarios))
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f: baseline = json.load(f)["results"]
+    app, results = QApplication(sys.argv[:1]), {}
+    for name in names:
+        results[name] = SCENARIOS[name](mindmap.MainWindow())
+        if baseline is None: print(f"{name}: {results[name]:.2f} ms", flush=True)
+    if args.json:
+        meta = {"python": platform.python_version(), "qt": QT_VERSION_STR, "machine": platform.machine(), "platform": platform.platform(), "cpus": os.cpu_count()}
+        with open(args.json, "w", encoding="utf-8") as f: json.dump({"meta": meta, "unit": "ms", "results": results}, f, indent=1)
+    if baseline is not None and compare(results, baseline, args.tolerance): return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,301 @@
+import sys
+import os
+import json
+import mmap
+import math
+import struct
+import queue
+import random
+import threading
+from array import array
+from collections import OrderedDict
+
+# Binary .mapb layout (little-endian), every section padded to 8 bytes so it can be used straight from an mmap:
+#   header | chunk directory | block columns | edge columns | string offsets | string blob
+# Blocks are sorted by spatial chunk (row-major), so each chunk is one contiguous run of records.
+MAGIC = b"MMAPBIN\0"
+VERSION = 1
+CHUNK_SIZE = 1000
+HEADER = struct.Struct("<8sHHfIIIIII")
+CHUNK = struct.Struct("<iiII")
+BLOCK_COLUMNS = (("xs", "d"), ("ys", "d"), ("ws", "d"), ("hs", "d"), ("bcs", "I"), ("tcs", "I"),
+                 ("has", "B"), ("vas", "B"), ("uids", "I"), ("txts", "I"), ("fpaths", "I"))
+EDGE_COLUMNS = (("e1", "I"), ("e2", "I"), ("ecs", "I"), ("ess", "B"), ("eds", "B"))
+LONG_EDGE_CHUNKS = 256
+MAP_EXTS = (".map", ".mapb")
+JOURNAL_EXT = ".journal"
+
+def color_int(name): return int(name.lstrip("#")[:6], 16)
+def color_name(v): return "#%06x" % v
+
+def _pad(n): return (n + 7) & ~7
+
+def fresh_uid(uid, taken):
+    # Replacement for a duplicated block id, drawn from a generator seeded by the id so that the same map gets the
+    # same ids on every load and its journal keeps applying; taken gains the new id
+    rnd = random.Random(uid)
+    while True:
+        new = str(rnd.randint(1000000, 9999999))
+        if new not in taken: taken.add(new); return new
+
+def unique_blocks(blocks):
+    # Older maps can hold two blocks with the same random id. As when such maps were read into a dict of id -> block,
+    # the last one in the file keeps the id and so its lines; earlier ones get a fresh id
+    last = {b["id"]: i for i, b in enumerate(blocks)}
+    if len(last) == len(blocks): return blocks
+    taken = set(last)
+    return [b if last[b["id"]] == i else dict(b, id=fresh_uid(b["id"], taken)) for i, b in enumerate(blocks)]
+
+class BlockStore:
+    # Compact array-backed map: numbers live in typed arrays, text stays utf-8 until a record is asked for
+    def __init__(self, bg="#2b2b2b", chunk_size=CHUNK_SIZE):
+        self.bg, self.chunk_size = bg, chunk_size
+        for name, code in BLOCK_COLUMNS + EDGE_COLUMNS: setattr(self, name, array(code))
+        self.str_offsets, self.blob = array("I", [0]), b""
+        self.chunks = {}; self._uid_index = self._bounds = None
+
+    def __len__(self): return len(self.xs)
+    def edge_count(self): return len(self.e1)
+
+    def string(self, k): return self.blob[self.str_offsets[k]:self.str_offsets[k + 1]].decode("utf-8")
+    def uid(self, i): return self.string(self.uids[i])
+
+    def record(self, i):
+        return {"x": self.xs[i], "y": self.ys[i], "txt": self.string(self.txts[i]), "bc": color_name(self.bcs[i]), "tc": color_name(self.tcs[i]),
+                "ha": self.has[i], "va": self.vas[i], "id": self.uid(i), "w": self.ws[i], "h": self.hs[i], "f_path": self.string(self.fpaths[i])}
+
+    def line(self, e):
+        return {"b1": self.uid(self.e1[e]), "b2": self.uid(self.e2[e]), "c": color_name(self.ecs[e]), "s": self.ess[e], "dir": bool(self.eds[e])}
+
+    def chunk_key(self, x, y): return (math.floor(x / self.chunk_size), math.floor(y / self.chunk_size))
+
+    def chunks_in(self, left, top, right, bottom):
+        (x0, y0), (x1, y1) = self.chunk_key(left, top), self.chunk_key(right, bottom)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.chunks):
+            return [k for k in self.chunks if x0 <= k[0] <= x1 and y0 <= k[1] <= y1]
+        return [(cx, cy) for cy in range(y0, y1 + 1) for cx in range(x0, x1 + 1) if (cx, cy) in self.chunks]
+
+    def chunk_blocks(self, key):
+        start, count = self.chunks[key][:2]
+        return range(start, start + count)
+
+    def chunk_edges(self, key): return self.chunks[key][2]
+
+    def edges_of(self, i): return self.adj_edges[self.adj_offsets[i]:self.adj_offsets[i + 1]]
+
+    def index_of(self, uid):
+        if self._uid_index is None: self._uid_index = {self.uid(i): i for i in range(len(self))}
+        return self._uid_index.get(uid)
+
+    def bounds(self):
+        if not len(self): return None
+        if self._bounds is None:
+            self._bounds = (min(self.xs), min(self.ys), max(x + w for x, w in zip(self.xs, self.ws)), max(y + h for y, h in zip(self.ys, self.hs)))
+        return self._bounds
+
+    def edge_span(self, e):
+        # (x0, y0, x1, y1): the chunks the bounding box of edge e touches, between the centres of its blocks
+        a, b, cs = self.e1[e], self.e2[e], self.chunk_size
+        ax, ay, bx, by = self.xs[a] + self.ws[a] / 2, self.ys[a] + self.hs[a] / 2, self.xs[b] + self.ws[b] / 2, self.ys[b] + self.hs[b] / 2
+        return math.floor(min(ax, bx) / cs), math.floor(min(ay, by) / cs), math.floor(max(ax, bx) / cs), math.floor(max(ay, by) / cs)
+
+    def _index(self, chunk_runs):
+        # chunk -> [first record, record count, edges whose bounding box touches it]; CSR adjacency for edges_of
+        self.chunks = {key: [start, count, []] for key, start, count in chunk_runs}
+        self.long_edges = []
+        for e in range(len(self.e1)):
+            x0, y0, x1, y1 = self.edge_span(e)
+            if (x1 - x0 + 1) * (y1 - y0 + 1) > LONG_EDGE_CHUNKS: self.long_edges.append(e); continue
+            for cy in range(y0, y1 + 1):
+                for cx in range(x0, x1 + 1):
+                    c = self.chunks.get((cx, cy))
+                    if c is None: c = self.chunks[(cx, cy)] = [0, 0, []]
+                    c[2].append(e)
+        degree = array("I", bytes(4 * (len(self) + 1)))
+        for e in range(len(self.e1)): degree[self.e1[e] + 1] += 1; degree[self.e2[e] + 1] += 1
+        for i in range(len(self)): degree[i + 1] += degree[i]
+        self.adj_offsets, fill = degree, array("I", degree)
+        self.adj_edges = array("I", bytes(4 * degree[-1]))
+        for e in range(len(self.e1)):
+            for i in (self.e1[e], self.e2[e]): self.adj_edges[fill[i]] = e; fill[i] += 1
+
+    @classmethod
+    def from_dict(cls, data, chunk_size=CHUNK_SIZE):
+        store = cls(data.get("bg", "#2b2b2b"), chunk_size)
+        blocks = sorted(unique_blocks(data["blocks"]), key=lambda b: store.chunk_key(b["x"], b["y"])[::-1])
+        strings, parts = {}, []
+        def intern(s):
+            k = strings.get(s)
+            if k is None:
+                k = strings[s] = len(parts); raw = s.encode("utf-8"); parts.append(raw)
+                store.str_offsets.append(store.str_offsets[-1] + len(raw))
+            return k
+        index, runs = {}, []
+        for i, b in enumerate(blocks):
+            key = store.chunk_key(b["x"], b["y"])
+            if runs and runs[-1][0] == key: runs[-1][2] += 1
+            else: runs.append([key, i, 1])
+            index[b["id"]] = i
+            store.xs.append(b["x"]); store.ys.append(b["y"]); store.ws.append(b.get("w", 190)); store.hs.append(b.get("h", 40))
+            store.bcs.append(color_int(b["bc"])); store.tcs.append(color_int(b.get("tc", "#FFFFFF")))
+            store.has.append(b.get("ha", 1)); store.vas.append(b.get("va", 1))
+            store.uids.append(intern(b["id"])); store.txts.append(intern(b["txt"])); store.fpaths.append(intern(b.get("f_path", "")))
+        for l in data["lines"]:
+            i1, i2 = index.get(l["b1"]), index.get(l["b2"])
+            if i1 is None or i2 is None: continue
+            store.e1.append(i1); store.e2.append(i2); store.ecs.append(color_int(l["c"])); store.ess.append(l["s"]); store.eds.append(1 if l.get("dir", False) else 0)
+        store.blob = b"".join(parts)
+        store._index(runs)
+        return store
+
+    def _unique_uids(self):
+        # Equal ids share one interned string, so a duplicate shows up in the uids column; lines here are stored by
+        # record, so only the id changes, and the last record with an id keeps it as in unique_blocks
+        if len(set(self.uids)) == len(self.uids): return
+        last = {k: i for i, k in enumerate(self.uids)}; taken = {self.string(k) for k in last}; extra = []
+        for i, k in enumerate(self.uids):
+            if last[k] == i: continue
+            raw = fresh_uid(self.string(k), taken).encode("utf-8"); extra.append(raw)
+            self.uids[i] = len(self.str_offsets) - 1; self.str_offsets.append(self.str_offsets[-1] + len(raw))
+        self.blob = bytes(self.blob) + b"".join(extra); self._uid_index = None
+
+    def to_dict(self):
+        return {"bg": self.bg, "blocks": [self.record(i) for i in range(len(self))], "lines": [self.line(e) for e in range(len(self.e1))]}
+
+def _columns(store, columns):
+    for name, _ in columns:
+        col = getattr(store, name)
+        if sys.byteorder == "big": col = array(col.typecode, col); col.byteswap()
+        raw = col.tobytes(); yield raw + bytes(_pad(len(raw)) - len(raw))
+
+def write_binary(path, data):
+    store = data if isinstance(data, BlockStore) else BlockStore.from_dict(data)
+    runs = [(k, c[0], c[1]) for k, c in sorted(store.chunks.items(), key=lambda kv: kv[0][::-1]) if c[1]]
+    bg = color_int(store.bg)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, store.chunk_size, len(store), store.edge_count(), len(runs), len(store.str_offsets), len(store.blob), bg))
+        f.write(bytes(_pad(HEADER.size) - HEADER.size))
+        directory = b"".join(CHUNK.pack(k[0], k[1], start, count) for k, start, count in runs)
+        f.write(directory + bytes(_pad(len(directory)) - len(directory)))
+        for raw in _columns(store, BLOCK_COLUMNS + EDGE_COLUMNS + (("str_offsets", "I"),)): f.write(raw)
+        f.write(store.blob)
+
+def read_binary(path):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version, _, chunk_size, n_blocks, n_edges, n_chunks, n_strings, blob_len, bg = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC: raise ValueError(f"{path} is not a binary map")
+        if version > VERSION: raise ValueError(f"{path} uses map format v{version}, this build reads up to v{VERSION}")
+        store = BlockStore(color_name(bg), chunk_size)
+        pos = _pad(HEADER.size)
+        runs = [((cx, cy), start, count) for cx, cy, start, count in CHUNK.iter_unpack(mm[pos:pos + n_chunks * CHUNK.size])]
+        pos += _pad(n_chunks * CHUNK.size)
+        for columns, n in ((BLOCK_COLUMNS, n_blocks), (EDGE_COLUMNS, n_edges), ((("str_offsets", "I"),), n_strings)):
+            for name, code in columns:
+                col = array(code); size = n * col.itemsize
+                col.frombytes(mm[pos:pos + size])
+                if sys.byteorder == "big": col.byteswap()
+                setattr(store, name, col); pos += _pad(size)
+        store.blob = mm[pos:pos + blob_len]
+    store._unique_uids(); store._index(runs)
+    return store
+
+def is_binary(path):
+    with open(path, "rb") as f: return f.read(len(MAGIC)) == MAGIC
+
+def load(path):
+    if is_binary(path): return read_binary(path)
+    with open(path, "r") as f: return BlockStore.from_dict(json.load(f))
+
+def save(path, data):
+    # Written next to the target and swapped in with os.replace, so a crash mid-write never leaves a half-written map
+    tmp = path + ".tmp"
+    try:
+        if path.lower().endswith(".mapb"): write_binary(tmp, data)
+        else:
+            with open(tmp, "w") as f: json.dump(data.to_dict() if isinstance(data, BlockStore) else data, f)
+        with open(tmp, "r+b") as f: os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp) and not os.path.isdir(tmp): os.remove(tmp)
+        raise
+
+class MapCache:
+    # Recently opened maps, kept parsed so navigating back to one skips the file read. An entry is reused only while
+    # the file's mtime and size are unchanged; least recently used maps go once there are more than max_maps or
+    # the cached maps hold more than max_blocks records in total.
+    def __init__(self, max_maps=8, max_blocks=200000):
+        self.max_maps, self.max_blocks = max_maps, max_blocks
+        self._maps = OrderedDict()
+
+    def load(self, path):
+        key, st = os.path.abspath(path), os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size); hit = self._maps.get(key)
+        if hit is not None and hit[0] == stamp:
+            self._maps.move_to_end(key); return hit[1]
+        store = load(path); self._maps[key] = (stamp, store); self._maps.move_to_end(key)
+        while len(self._maps) > 1 and (len(self._maps) > self.max_maps or sum(len(s) for _, s in self._maps.values()) > self.max_blocks):
+            self._maps.popitem(last=False)
+        return store
+
+def read_journal(map_path):
+    ops, path = [], map_path + JOURNAL_EXT
+    if not os.path.exists(path): return ops
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try: ops.append(json.loads(line))
+            except ValueError: pass  # torn last line from a crash
+    return ops
+
+class MapJournal:
+    # Append-only JSON-lines log of block/connection changes next to a map. A writer thread owns the file:
+    # record() only queues a line, snapshot() writes the whole map atomically and then starts an empty journal.
+    # The journal is opened here, so a folder that cannot be written raises to the caller; later write and snapshot
+    # failures leave the thread running and wait in error for take_error(); failing stays set until a write works again.
+    def __init__(self, map_path):
+        self.map_path, self.path = map_path, map_path + JOURNAL_EXT
+        self.pending, self.error, self.failing = 0, None, False
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True); self._thread.start()
+
+    def record(self, op, **fields):
+        fields["op"] = op; self._queue.put(json.dumps(fields)); self.pending += 1
+
+    def snapshot(self, data): self._queue.put(("snapshot", data)); self.pending = 0
+
+    def flush(self): self._queue.join()
+
+    def close(self): self._queue.put(None); self._thread.join()
+
+    def take_error(self):
+        e, self.error = self.error, None
+        return e
+
+    def _run(self):
+        stop = False
+        try:
+            while not stop:
+                batch = [self._queue.get()]
+                while True:
+                    try: batch.append(self._queue.get_nowait())
+                    except queue.Empty: break
+                for item in batch:
+                    if item is None: stop = True; continue
+                    try:
+                        if isinstance(item, str): self._file.write(item + "\n")
+                        else:
+                            self._file.flush(); save(self.map_path, item[1])
+                            self._file.close(); self._file = open(self.path, "w", encoding="utf-8")
+                        self.failing = False
+                    except Exception as e: self.error, self.failing = e, True
+                try: self._file.flush()
+                except Exception as e: self.error, self.failing = e, True
+                for _ in batch: self._queue.task_done()
+        finally: self._file.close()
+
+def convert(src, dst): save(dst, load(src))
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python mapformat.py <in.map|in.mapb> <out.map|out.mapb>"); sys.exit(2)
+    convert(sys.argv[1], sys.argv[2])
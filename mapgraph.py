@@ -0,0 +1,67 @@
+class MapGraph:
+    # Connectivity of a map, keyed by block uid and free of Qt. An edge runs b1 -> b2 whether or not it is drawn with
+    # arrows; out[b1][b2] and inc[b2][b1] hold the same payload (the scene stores its ConnectionLine there), so
+    # edge lookups, duplicate checks and per-block removal are dict operations instead of list scans.
+    def __init__(self):
+        self.out, self.inc = {}, {}
+
+    def __len__(self): return sum(len(d) for d in self.out.values())
+
+    def clear(self): self.out.clear(); self.inc.clear()
+
+    def has_edge(self, a, b): return b in self.out.get(a, ())
+    def edge(self, a, b): return self.out.get(a, {}).get(b)
+    def successors(self, a): return list(self.out.get(a, ()))
+    def predecessors(self, b): return list(self.inc.get(b, ()))
+
+    def edges_of(self, uid):
+        # Every payload touching uid; a self-loop shows up twice
+        return [*self.out.get(uid, {}).values(), *self.inc.get(uid, {}).values()]
+
+    def edges(self):
+        for a, targets in self.out.items():
+            for b, data in targets.items(): yield a, b, data
+
+    def add_edge(self, a, b, data=True):
+        # An existing a -> b edge is kept and returned, so the graph never holds parallel edges
+        targets = self.out.setdefault(a, {})
+        if b in targets: return targets[b]
+        targets[b] = data; self.inc.setdefault(b, {})[a] = data
+        return data
+
+    def add_edges(self, edges): return [self.add_edge(a, b, data) for a, b, data in edges]
+
+    def remove_edge(self, a, b):
+        data = self.out.get(a, {}).pop(b, None)
+        if data is not None: self.inc[b].pop(a, None)
+        return data
+
+    def remove_edges(self, pairs): return [d for d in (self.remove_edge(a, b) for a, b in pairs) if d is not None]
+
+    def heal_pairs(self, uids):
+        # (a, b) edges that keep every path a -> removed... -> b alive once uids are gone; the result equals splicing
+        # the blocks out one at a time, minus edges that already exist
+        uids, pairs, seen_pairs = dict.fromkeys(uids), [], set()
+        for d in uids:
+            sources = [a for a in self.inc.get(d, ()) if a not in uids]
+            if not sources: continue
+            targets, stack, seen = {}, [d], {d}
+            while stack:
+                for b in self.out.get(stack.pop(), ()):
+                    if b in uids:
+                        if b not in seen: seen.add(b); stack.append(b)
+                    else: targets[b] = None
+            for a in sources:
+                for b in targets:
+                    if a != b and (a, b) not in seen_pairs and not self.has_edge(a, b): seen_pairs.add((a, b)); pairs.append((a, b))
+        return pairs
+
+    def remove_nodes(self, uids):
+        # Drops the blocks and returns the payloads of every edge that touched them, each once
+        removed = {}
+        for uid in uids:
+            for b, data in self.out.pop(uid, {}).items():
+                removed[id(data)] = data; self.inc.get(b, {}).pop(uid, None)
+            for a, data in self.inc.pop(uid, {}).items():
+                removed[id(data)] = data; self.out.get(a, {}).pop(uid, None)
+        return list(removed.values())
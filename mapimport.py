@@ -0,0 +1,157 @@
+import os
+import time
+import hashlib
+import threading
+from itertools import islice
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage, QImageReader
+
+from mapjob import BackgroundJob
+
+THUMB_DIR = os.path.join(os.path.expanduser("~"), ".mindmap_thumbs")
+THUMB_SIZE = 256
+# Listing folders, stat calls and image decoding mostly wait on the disk or release the GIL, so the pool is wider than the CPU count
+WORKERS = min(16, (os.cpu_count() or 1) * 2)
+# File existence is looked at again once a result is this many seconds old
+RECHECK = 30.0
+# Thumbnails kept in memory; the least recently shown go first and are read back from THUMB_DIR when shown again.
+# Those asked for in a scene's latest frame are never dropped, so the cache grows past this while more are on screen
+THUMB_CACHE = 500
+
+_thumb_exts = None
+
+def thumb_exts():
+    # Everything QImageReader can open, which includes .pdf when QtPdf's image plugin is installed
+    global _thumb_exts
+    if _thumb_exts is None: _thumb_exts = {"." + bytes(f).decode() for f in QImageReader.supportedImageFormats()}
+    return _thumb_exts
+
+def has_thumb(path): return os.path.splitext(path)[1].lower() in thumb_exts()
+
+def scan_dir(path):
+    # Runs on a pool thread: the files and subfolders of one folder, each sorted by name; hidden entries and
+    # symlinked folders are skipped, so a link cannot send the walk round in a cycle
+    files, dirs = [], []
+    with os.scandir(path) as it:
+        for e in sorted(it, key=lambda e: e.name.casefold()):
+            if e.name.startswith("."): continue
+            try:
+                if e.is_dir(follow_symlinks=False): dirs.append(e.path)
+                elif e.is_file(): files.append(e.path)
+            except OSError: pass
+    return files, dirs
+
+def make_thumb(path, folder):
+    # A QImage at most THUMB_SIZE on its longer side, or None. Results are kept as PNGs named by path, mtime and size,
+    # so a changed file gets a new one; a file no reader handles leaves an empty file and is not tried again.
+    st = os.stat(path)
+    key = hashlib.sha1(f"{os.path.normcase(os.path.abspath(path))}|{st.st_mtime_ns}|{st.st_size}".encode()).hexdigest()
+    out = os.path.join(folder, key + ".png")
+    if os.path.exists(out): return QImage(out) if os.path.getsize(out) else None
+    r = QImageReader(path); r.setAutoTransform(True); size = r.size()
+    if size.isValid() and max(size.width(), size.height()) > THUMB_SIZE: r.setScaledSize(size.scaled(THUMB_SIZE, THUMB_SIZE, Qt.AspectRatioMode.KeepAspectRatio))
+    img = r.read()
+    if not img.isNull() and max(img.width(), img.height()) > THUMB_SIZE:
+        img = img.scaled(THUMB_SIZE, THUMB_SIZE, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+    os.makedirs(folder, exist_ok=True); tmp = out + f".{threading.get_ident()}.tmp"
+    if img.isNull(): open(tmp, "wb").close()
+    elif not img.save(tmp, "PNG"): return img
+    os.replace(tmp, out)
+    return None if img.isNull() else img
+
+class BulkImport(BackgroundJob):
+    # Walks files and folders on a daemon thread, listing every folder on a thread pool. ready holds one list of
+    # file paths per folder, in the order folders finish, for the GUI to take in batches; found counts them all.
+    def __init__(self, paths, workers=WORKERS):
+        super().__init__(); self.ready, self.found = deque(), 0
+        self.start(list(paths), workers)
+
+    def _add(self, files):
+        if files: self.ready.append(files); self.found += len(files)
+
+    def run(self, paths, workers):
+        self._add([p for p in paths if os.path.isfile(p)])
+        pool = ThreadPoolExecutor(workers, thread_name_prefix="import")
+        try:
+            running = {pool.submit(scan_dir, p) for p in paths if os.path.isdir(p)}
+            while running and not self.stopped():
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    try: files, dirs = fut.result()
+                    except OSError: continue  # an unreadable folder is skipped, the rest still comes in
+                    self._add(files); running |= {pool.submit(scan_dir, d) for d in dirs}
+        finally: pool.shutdown(cancel_futures=True)
+
+class Previews:
+    # Thumbnails and file existence for blocks, worked out on a thread pool the first time a block asks. Lookups never
+    # block: they return None until the answer is in. Every scene that watch()es gets its own set of the paths whose
+    # answers came in (or changed), so each window learns what to repaint however many poll.
+    def __init__(self, folder=None, workers=WORKERS, max_thumbs=THUMB_CACHE):
+        self.folder, self.workers, self.pool, self.max_thumbs = folder or THUMB_DIR, workers, None, max_thumbs
+        self.thumbs, self.links, self.busy = OrderedDict(), {}, set()
+        self.landed, self.shown = {}, {}  # per scene, paths not yet taken and the thumbnails it asked for in its latest frame
+        self._lock = threading.Lock()  # thumbs is reordered by the GUI and filled by the pool
+
+    def _submit(self, key, fn, path):
+        if key in self.busy: return
+        if self.pool is None: self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix="preview")
+        self.busy.add(key); self.pool.submit(fn, path)
+
+    def thumbnail(self, path):
+        # QImage, or None while it is being made or when the file has no preview
+        with self._lock:
+            if path in self.thumbs: self.thumbs.move_to_end(path); return self.thumbs[path]
+        self._submit(("thumb", path), self._thumb, path); return None
+
+    def link_ok(self, path):
+        # True or False once the file has been looked for, None before; old answers are kept while being re-checked
+        hit = self.links.get(path)
+        if hit is None or time.monotonic() - hit[1] > RECHECK: self._submit(("link", path), self._check, path)
+        return None if hit is None else hit[0]
+
+    def end_frame(self, owner, paths):
+        # Called once a scene has painted; an empty set unpins everything it had
+        with self._lock:
+            if paths: self.shown[owner] = paths
+            else: self.shown.pop(owner, None)
+
+    def pending(self): return bool(self.busy)
+
+    def watch(self, owner):
+        # Before asking, so nothing lands unseen; unwatch() once idle
+        with self._lock: self.landed.setdefault(owner, set())
+
+    def unwatch(self, owner):
+        with self._lock: self.landed.pop(owner, None)
+
+    def take_landed(self, owner):
+        with self._lock:
+            out = self.landed.get(owner)
+            if out: self.landed[owner] = set()
+            return out or set()
+
+    def _land(self, path):
+        with self._lock:
+            for paths in self.landed.values(): paths.add(path)
+
+    def _thumb(self, path):
+        try: img = make_thumb(path, self.folder)
+        except OSError: img = None
+        with self._lock:
+            self.thumbs[path] = img; self.thumbs.move_to_end(path)
+            over = len(self.thumbs) - self.max_thumbs
+            if over > 0:
+                keep = set().union(*self.shown.values())
+                for p in list(islice((p for p in self.thumbs if p not in keep), over)): del self.thumbs[p]
+        self._land(path); self.busy.discard(("thumb", path))
+
+    def _check(self, path):
+        ok, old = os.path.exists(path), self.links.get(path)
+        self.links[path] = (ok, time.monotonic())
+        if old is not None and old[0] != ok:
+            with self._lock: self.thumbs.pop(path, None)  # a file that came back gets its preview made again
+        if old is None or old[0] != ok: self._land(path)
+        self.busy.discard(("link", path))
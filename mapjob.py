@@ -0,0 +1,20 @@
+import threading
+
+class BackgroundJob:
+    # Base for work done on a daemon thread and polled by the GUI: subclasses set up their state, then call start(),
+    # and put the work in run(), checking stopped() between steps. error holds whatever run() raised; done is set
+    # once it has returned either way, after which the results can be read without locks.
+    def __init__(self): self.error = None; self.done = self._stop = False
+
+    def start(self, *args):
+        self._thread = threading.Thread(target=self._main, args=args, daemon=True); self._thread.start()
+
+    def cancel(self): self._stop = True
+    def stopped(self): return self._stop
+
+    def run(self, *args): raise NotImplementedError
+
+    def _main(self, *args):
+        try: self.run(*args)
+        except Exception as e: self.error = e
+        finally: self.done = True
@@ -0,0 +1,208 @@
+import math
+import time
+import threading
+
+import numpy as np
+
+from mapjob import BackgroundJob
+
+# Force-directed layout: Fruchterman-Reingold with an ideal edge length of SPACING_FACTOR x the median block width.
+# Repulsion is exact between nodes in neighbouring grid cells and goes through a hierarchy of cell centroids beyond
+# that, so one iteration costs O(n) instead of O(n^2); gravity towards the old centroid keeps the layout compact.
+SPACING_FACTOR = 1.6
+CELL_OCCUPANCY = 3
+GRAVITY = 2.0
+PUBLISH_EVERY = 5
+# Final overlap removal: blocks end up at least BLOCK_GAP apart (more than one grid step, so snapping cannot reintroduce overlaps)
+BLOCK_GAP, SEPARATE_PASSES = 40, 30
+# Layered layout: gaps between blocks in a layer and between layers, and barycentre ordering sweeps
+LAYER_HGAP, LAYER_VGAP = 40, 120
+ORDER_SWEEPS = 4
+# Share of the remaining distance the displayed positions cover per LayoutRun.step while the layout runs; once it is
+# done the blocks glide to their final positions over SETTLE_SECONDS, however few steps a big map gets
+EASE, SETTLE_SECONDS = 0.35, 0.5
+
+def _edges(edges, n):
+    e = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+    return e[(e[:, 0] != e[:, 1]) & (e.min(axis=1) >= 0) & (e.max(axis=1) < n)] if len(e) else e
+
+def _sum_into(n, idx, vec):
+    return np.stack((np.bincount(idx, vec[:, 0], n), np.bincount(idx, vec[:, 1], n)), axis=1)
+
+def _ranges(starts, counts):
+    # Concatenated arange(s, s + c) for every (s, c) pair
+    total = int(counts.sum())
+    if not total: return np.empty(0, dtype=np.intp)
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+
+def _neighbour_pairs(ij):
+    # Every ordered pair (i, j), i != j, of nodes whose grid cells touch
+    nx, ny = ij.max(axis=0) + 1
+    cid = ij[:, 1] * nx + ij[:, 0]; order = np.argsort(cid, kind="stable")
+    cells, starts, counts = np.unique(cid[order], return_index=True, return_counts=True)
+    pairs_i, pairs_j = [], []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            cx, cy = ij[:, 0] + dx, ij[:, 1] + dy
+            ok = np.flatnonzero((cx >= 0) & (cx < nx) & (cy >= 0) & (cy < ny)); target = cy[ok] * nx + cx[ok]
+            slot = np.minimum(np.searchsorted(cells, target), len(cells) - 1)
+            hit = cells[slot] == target; ok, slot = ok[hit], slot[hit]
+            c = counts[slot]; ii = np.repeat(ok, c); jj = order[_ranges(starts[slot], c)]
+            keep = ii != jj; pairs_i.append(ii[keep]); pairs_j.append(jj[keep])
+    return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+def _repulsion(pos, k):
+    # Exact between nodes in touching cells, hierarchical beyond that
+    n = len(pos); lo = pos.min(axis=0); span = np.maximum(pos.max(axis=0) - lo, k)
+    cell = max(k, math.sqrt(span[0] * span[1] * CELL_OCCUPANCY / n)); k2 = k * k
+    ij = ((pos - lo) // cell).astype(np.intp); ii, jj = _neighbour_pairs(ij)
+    d = pos[ii] - pos[jj]; d2 = np.maximum((d * d).sum(axis=1), 1.0)
+    return _sum_into(n, ii, d * (k2 / d2)[:, None]) + _far_field(pos, ij, k2)
+
+def _separate(pos, sizes, passes=SEPARATE_PASSES):
+    # Pushes overlapping blocks apart along the axis that needs the smaller move, until none overlap within BLOCK_GAP
+    n, half = len(pos), sizes / 2 + BLOCK_GAP / 2
+    cell = float(sizes.max() + BLOCK_GAP)
+    for _ in range(passes):
+        ii, jj = _neighbour_pairs(((pos - pos.min(axis=0)) // cell).astype(np.intp))
+        d = pos[ii] - pos[jj]; over = half[ii] + half[jj] - np.abs(d)
+        hit = (over > 0).all(axis=1)
+        if not hit.any(): break
+        ii, d, over = ii[hit], d[hit], over[hit]
+        axis = np.argmin(over, axis=1); push = np.zeros_like(d)
+        rows = np.arange(len(ii)); sign = np.where(d[rows, axis] >= 0, 1.0, -1.0)
+        sign[d[rows, axis] == 0] = np.where(ii[d[rows, axis] == 0] % 2, 1.0, -1.0)
+        push[rows, axis] = sign * over[rows, axis] / 2
+        pos = pos + _sum_into(n, ii, push)
+    return pos
+
+def _far_field(pos, ij, k2):
+    # Hierarchical grid: at each level a cell is pushed by the centroids of the cells that are not its neighbours but
+    # whose parents neighbour its parent. Every far pair is counted once, at the finest level where it is not adjacent.
+    n, far = len(pos), np.zeros_like(pos)
+    while True:
+        nx, ny = ij.max(axis=0) + 1
+        if nx <= 2 and ny <= 2: return far
+        cells, cell_of, mass = np.unique(ij[:, 1] * nx + ij[:, 0], return_inverse=True, return_counts=True)
+        centroid = _sum_into(len(cells), cell_of, pos) / mass[:, None]
+        cx, cy = cells % nx, cells // nx; px, py = cx // 2, cy // 2; push = np.zeros_like(centroid)
+        for pdy in (-1, 0, 1):
+            for pdx in (-1, 0, 1):
+                for child in range(4):
+                    bx, by = (px + pdx) * 2 + child % 2, (py + pdy) * 2 + child // 2
+                    a = np.flatnonzero((bx >= 0) & (bx < nx) & (by >= 0) & (by < ny) & (np.maximum(np.abs(bx - cx), np.abs(by - cy)) > 1))
+                    target = by[a] * nx + bx[a]; b = np.minimum(np.searchsorted(cells, target), len(cells) - 1)
+                    hit = cells[b] == target; a, b = a[hit], b[hit]
+                    d = centroid[a] - centroid[b]; d2 = np.maximum((d * d).sum(axis=1), 1.0)
+                    push += _sum_into(len(cells), a, d * (mass[b] * k2 / d2)[:, None])
+        far += push[cell_of]; ij = ij // 2
+
+def force_layout(pos, sizes, edges, iterations=None, publish=None, stop=None):
+    # pos are block centres; the result keeps their centroid
+    pos = np.array(pos, dtype=float).reshape(-1, 2); n = len(pos)
+    if n < 2: return pos
+    sizes = np.asarray(sizes, dtype=float).reshape(-1, 2); e = _edges(edges, n)
+    k = SPACING_FACTOR * float(np.median(sizes[:, 0])); side = k * math.sqrt(n); center = pos.mean(axis=0)
+    rng = np.random.default_rng(0)
+    if np.ptp(pos[:, 0]) * np.ptp(pos[:, 1]) < (side / 4) ** 2: pos = center + rng.uniform(-side / 2, side / 2, pos.shape)
+    else: pos = pos + rng.uniform(-k / 10, k / 10, pos.shape)
+    iterations = iterations or int(np.clip(2000 / math.sqrt(n), 60, 300))
+    for it in range(iterations):
+        if stop and stop(): break
+        disp = _repulsion(pos, k) - GRAVITY * (pos - center)
+        if len(e):
+            d = pos[e[:, 0]] - pos[e[:, 1]]; pull = d * (np.sqrt((d * d).sum(axis=1)) / k)[:, None]
+            disp -= _sum_into(n, e[:, 0], pull); disp += _sum_into(n, e[:, 1], pull)
+        temp = side / 10 * (1 - it / iterations) + k / 20
+        length = np.maximum(np.sqrt((disp * disp).sum(axis=1)), 1e-9)
+        pos += disp * (np.minimum(length, temp) / length)[:, None]
+        if publish and it % PUBLISH_EVERY == 0: publish(pos - pos.mean(axis=0) + center)
+    pos = _separate(pos, sizes)
+    return pos - pos.mean(axis=0) + center
+
+def layered_layout(pos, sizes, edges, publish=None, stop=None):
+    # Sugiyama-style: edges run b1 -> b2, cycles are broken by reversing edges that point back in a topological
+    # order, layers are longest paths from the sources, and barycentre sweeps order each layer.
+    # The result is centred under the old centroid and starts at the old top edge.
+    pos = np.array(pos, dtype=float).reshape(-1, 2); n = len(pos)
+    if n < 2: return pos
+    sizes = np.asarray(sizes, dtype=float).reshape(-1, 2); e = _edges(edges, n)
+    topo = _topological_order(n, e); rank = np.empty(n, dtype=np.intp); rank[topo] = np.arange(n)
+    back = rank[e[:, 0]] > rank[e[:, 1]]; e = np.where(back[:, None], e[:, ::-1], e)
+    layer = np.zeros(n, dtype=np.intp)
+    if len(e):
+        e = e[np.argsort(rank[e[:, 0]], kind="stable")]
+        for a, b in e.tolist():
+            if layer[b] <= layer[a]: layer[b] = layer[a] + 1
+    # Ordering: start from the old left-to-right order, then alternate down and up barycentre sweeps
+    key = pos[:, 0].copy()
+    for sweep in range(ORDER_SWEEPS):
+        order = np.lexsort((key, layer)); x = np.empty(n); x[order] = _rank_in_group(layer[order])
+        src, dst = (e[:, 0], e[:, 1]) if sweep % 2 == 0 else (e[:, 1], e[:, 0])
+        total, cnt = np.bincount(dst, x[src], n), np.bincount(dst, minlength=n)
+        key = np.where(cnt > 0, total / np.maximum(cnt, 1), x)
+    order = np.lexsort((key, layer)); lo = layer[order]
+    w = sizes[order, 0] + LAYER_HGAP; right = np.cumsum(w)
+    first = np.r_[0, np.flatnonzero(np.diff(lo)) + 1]; base = np.repeat(right[first] - w[first], np.diff(np.r_[first, n]))
+    x = right - base - w / 2; widths = np.bincount(lo, w); x -= widths[lo] / 2
+    heights = np.zeros(layer.max() + 1); np.maximum.at(heights, layer, sizes[:, 1])
+    tops = np.r_[0, np.cumsum(heights + LAYER_VGAP)[:-1]]
+    out = np.empty_like(pos); out[order, 0] = x; out[:, 1] = tops[layer] + sizes[:, 1] / 2
+    out[:, 0] += pos[:, 0].mean(); out[:, 1] += (pos[:, 1] - sizes[:, 1] / 2).min()
+    return out
+
+def _rank_in_group(groups):
+    first = np.r_[0, np.flatnonzero(np.diff(groups)) + 1]
+    counts = np.diff(np.r_[first, len(groups)])
+    return (np.arange(len(groups)) - np.repeat(first, counts)) / np.repeat(np.maximum(counts - 1, 1), counts)
+
+def _topological_order(n, e):
+    # Kahn's algorithm; when only cycles remain, the node with the most outgoing minus incoming edges goes next
+    out_start = np.r_[0, np.cumsum(np.bincount(e[:, 0], minlength=n))] if len(e) else np.zeros(n + 1, dtype=np.intp)
+    targets = e[np.argsort(e[:, 0], kind="stable"), 1].tolist() if len(e) else []
+    indeg = np.bincount(e[:, 1], minlength=n).tolist() if len(e) else [0] * n
+    outdeg = np.diff(out_start).tolist(); starts = out_start.tolist()
+    done, order = [False] * n, []
+    ready = [i for i in range(n) if indeg[i] == 0]; by_surplus = sorted(range(n), key=lambda i: indeg[i] - outdeg[i]); next_pick = 0
+    while len(order) < n:
+        if not ready:
+            while done[by_surplus[next_pick]]: next_pick += 1
+            ready.append(by_surplus[next_pick])
+        i = ready.pop()
+        if done[i]: continue
+        done[i] = True; order.append(i)
+        for j in targets[starts[i]:starts[i + 1]]:
+            indeg[j] -= 1
+            if indeg[j] == 0 and not done[j]: ready.append(j)
+    return np.array(order, dtype=np.intp)
+
+class LayoutRun(BackgroundJob):
+    # Runs a layout function on a daemon thread. Intermediate positions are published to a one-slot mailbox
+    # that the GUI drains with take(); the final positions land in result once done is set.
+    def __init__(self, fn, pos, *args):
+        super().__init__(); self.result = None; self._settle_from = None
+        self.shown = self.target = np.array(pos, dtype=float).reshape(-1, 2)
+        self._lock = threading.Lock(); self._frame = None
+        self.start(fn, (pos,) + args)
+
+    def step(self, ease=EASE):
+        # Positions to show next: part of the way from the last shown frame to the newest one; settled once the
+        # final result is shown exactly
+        frame = self.take()
+        if not (self.done and self.result is not None):
+            if frame is not None: self.target = frame
+            self.shown = self.shown + (self.target - self.shown) * ease
+            return self.shown, False
+        if self._settle_from is None: self._settle_from, self._settle_start = self.shown, time.monotonic()
+        f = min(1.0, (time.monotonic() - self._settle_start) / SETTLE_SECONDS)
+        self.shown = self.result if f >= 1 else self._settle_from + (self.result - self._settle_from) * f
+        return self.shown, f >= 1
+
+    def take(self):
+        with self._lock: frame, self._frame = self._frame, None
+        return frame
+
+    def _publish(self, pos):
+        with self._lock: self._frame = pos
+
+    def run(self, fn, args): self.result = fn(*args, publish=self._publish, stop=self.stopped)
@@ -0,0 +1,60 @@
+import os
+import json
+import time
+import threading
+import functools
+from collections import deque, defaultdict
+
+# Trace events kept for export; older ones are dropped first
+TRACE_EVENTS = 200000
+
+class Profiler:
+    # Counts calls and sums inclusive time per "Class.method", keyed by the class of the object each call was made
+    # on, and keeps every call as a Chrome trace event. Methods are wrapped only while installed: uninstall puts the
+    # originals back, so with profiling off the classes are exactly as written and cost nothing extra.
+    def __init__(self, max_events=TRACE_EVENTS):
+        self.calls, self.total = defaultdict(int), defaultdict(float)
+        self.events, self.frames = deque(maxlen=max_events), deque(maxlen=240)
+        self.frame_calls, self.last_frame = defaultdict(int), {}
+        self.t0, self._patched = time.perf_counter(), []
+
+    def wrap(self, cls, name):
+        orig, record = cls.__dict__[name], self.record
+        @functools.wraps(orig)
+        def timed(obj, *args, **kwargs):
+            t = time.perf_counter()
+            try: return orig(obj, *args, **kwargs)
+            finally: record(f"{type(obj).__name__}.{name}", t, time.perf_counter())
+        self._patched.append((cls, name, orig)); setattr(cls, name, timed)
+
+    def install(self, targets):
+        for cls, names in targets:
+            for name in names: self.wrap(cls, name)
+
+    def uninstall(self):
+        for cls, name, orig in reversed(self._patched): setattr(cls, name, orig)
+        self._patched.clear()
+
+    def record(self, key, t, t1):
+        self.calls[key] += 1; self.total[key] += t1 - t; self.frame_calls[key] += 1
+        self.events.append((key, t, t1, threading.get_ident()))
+
+    def end_frame(self, t, t1):
+        # last_frame holds what ran since the previous frame ended, including the moves and updates that led up to it
+        self.record("frame", t, t1); self.frames.append((t1, t1 - t))
+        self.last_frame, self.frame_calls = self.frame_calls, defaultdict(int)
+
+    def fps(self, now=None):
+        now = time.perf_counter() if now is None else now
+        return sum(1 for t1, _ in self.frames if now - t1 <= 1.0)
+
+    def top(self, n=5):
+        return sorted(((k, self.calls[k], self.total[k]) for k in self.total if k != "frame"), key=lambda r: -r[2])[:n]
+
+    def write_trace(self, path):
+        # Chrome trace format (chrome://tracing, Perfetto): one complete ("X") event per call, times in microseconds
+        pid = os.getpid()
+        events = [{"name": key, "cat": key.split(".")[0], "ph": "X", "ts": (t - self.t0) * 1e6, "dur": (t1 - t) * 1e6, "pid": pid, "tid": tid}
+                  for key, t, t1, tid in list(self.events)]
+        with open(path, "w", encoding="utf-8") as f: json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
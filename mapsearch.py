@@ -0,0 +1,108 @@
+import re
+import heapq
+from bisect import bisect_left, insort
+
+TOKEN = re.compile(r"[^\W_]+")
+# Query terms this long also match words one edit away (typo, missing or extra letter, swapped neighbours)
+FUZZY_MIN = 4
+EXACT, PREFIX, FUZZY = 3, 2, 1
+# More new words than this since the last search and the sorted vocabulary is rebuilt instead of patched
+RESORT_AFTER = 64
+
+def words(text): return set(TOKEN.findall(text.casefold()))
+
+def _variants(t): return {t, *(t[:i] + t[i + 1:] for i in range(len(t)))}
+
+def _fuzzy_word(t): return len(t) >= FUZZY_MIN - 1 and not t.isdigit()
+
+def _one_edit(a, b):
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1: return False
+    i = 0
+    while i < min(la, lb) and a[i] == b[i]: i += 1
+    if la > lb: return a[i + 1:] == b[i:]
+    if la < lb: return a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i + 1:] or (i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:])
+
+class TextIndex:
+    # Inverted index from lower-cased words to block uids, updated one block at a time. docs holds each block's
+    # (text, file name, words, sort key); near maps every one-deletion variant of a word to the words it came from,
+    # so fuzzy terms are a few dict lookups instead of a scan of the vocabulary.
+    def __init__(self):
+        self.docs, self.postings, self.near = {}, {}, {}
+        self._vocab, self._new, self._dead = [], [], 0
+
+    def __len__(self): return len(self.docs)
+
+    def set(self, uid, text, name=""):
+        doc = self.docs.get(uid)
+        if doc is not None and doc[0] == text and doc[1] == name: return
+        old, new = doc[2] if doc else set(), words(text) | words(name)
+        self.docs[uid] = (text, name, new, text.casefold())
+        for t in old - new: self._unpost(t, uid)
+        for t in new - old: self._post(t, uid)
+
+    def remove(self, uid):
+        doc = self.docs.pop(uid, None)
+        for t in doc[2] if doc else (): self._unpost(t, uid)
+
+    def _post(self, t, uid):
+        s = self.postings.get(t)
+        if s is None:
+            s = self.postings[t] = set(); self._new.append(t)
+            if _fuzzy_word(t):
+                for v in _variants(t): self.near.setdefault(v, set()).add(t)
+        s.add(uid)
+
+    def _unpost(self, t, uid):
+        s = self.postings[t]; s.discard(uid)
+        if s: return
+        del self.postings[t]; self._dead += 1
+        if _fuzzy_word(t):
+            for v in _variants(t):
+                ts = self.near[v]; ts.discard(t)
+                if not ts: del self.near[v]
+
+    def vocab(self):
+        # Sorted words for prefix ranges; removed words linger until the next rebuild and are skipped by the readers
+        if len(self._new) > RESORT_AFTER or self._dead > len(self._vocab) // 4:
+            self._vocab = sorted(self.postings); self._dead = 0
+        else:
+            for t in self._new:
+                i = bisect_left(self._vocab, t)
+                if i == len(self._vocab) or self._vocab[i] != t: insort(self._vocab, t)
+        self._new = []
+        return self._vocab
+
+    def term_layers(self, q):
+        # [(score, uids)] for blocks whose best word matches q exactly, as a prefix, or one edit away; the sets are
+        # disjoint and built with set operations, so a word shared by every block costs no Python-level loop
+        vocab, post = self.vocab(), self.postings
+        exact = set(post.get(q, ())); prefix, fuzzy = [], []
+        i = bisect_left(vocab, q)
+        while i < len(vocab) and vocab[i].startswith(q):
+            if vocab[i] != q and vocab[i] in post: prefix.append(post[vocab[i]])
+            i += 1
+        if len(q) >= FUZZY_MIN:
+            fuzzy = [post[t] for t in set().union(*(self.near.get(v, ()) for v in _variants(q))) if not t.startswith(q) and _one_edit(q, t)]
+        prefix = set().union(*prefix) - exact; fuzzy = set().union(*fuzzy) - exact - prefix
+        return [(s, us) for s, us in ((EXACT, exact), (PREFIX, prefix), (FUZZY, fuzzy)) if us]
+
+    def search(self, query, limit=None):
+        # Blocks matching every term, best total score first, then alphabetically. A block sits in one layer per term,
+        # so intersecting a layer of each term gives disjoint groups scored by the sum; past the limit, ties are cut
+        # by uid so a word shared by thousands of blocks never has them all sorted by text.
+        groups = [(0, None)]
+        for q in words(query):
+            groups = [(s + t, us if acc is None else acc & us) for s, acc in groups for t, us in self.term_layers(q)]
+            groups = [(s, us) for s, us in groups if us]
+            if not groups: return []
+        layers = {}
+        for s, us in groups:
+            if us is not None: layers.setdefault(s, set()).update(us)
+        ranked = []
+        for _, us in sorted(layers.items(), reverse=True):
+            room = limit - len(ranked) if limit else len(us)
+            if room <= 0: break
+            ranked += sorted(heapq.nsmallest(room, us) if room < len(us) else us, key=lambda u: self.docs[u][3])
+        return ranked
@@ -0,0 +1,124 @@
+import os
+import json
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+import mapformat
+import mapsearch
+from mapjob import BackgroundJob
+from mapformat import MAP_EXTS, JOURNAL_EXT
+
+INDEX_VERSION = 1
+INDEX_PATH = os.path.join(os.path.expanduser("~"), ".mindmap_index.json")
+WORKERS = min(4, os.cpu_count() or 1)
+
+def norm(path): return os.path.normcase(os.path.abspath(path))
+
+def is_map(path): return os.path.splitext(path)[1].lower() in MAP_EXTS
+
+def link_target(map_path, f_path):
+    # Imported files are stored as absolute paths; a relative one is taken as relative to the map that holds it
+    return norm(os.path.join(os.path.dirname(map_path), os.path.expanduser(f_path)))
+
+def stamp(path):
+    # Unsaved edits live in the journal next to a map, so it is part of the map's stamp
+    st, j = os.stat(path), path + JOURNAL_EXT
+    js = os.stat(j) if os.path.exists(j) else None
+    return [st.st_mtime_ns, st.st_size, js.st_mtime_ns if js else 0, js.st_size if js else 0]
+
+def scan_map(path):
+    # Runs in a worker process: [uid, text, linked path] for every block of the map with its journal replayed
+    store = mapformat.load(path)
+    blocks = {store.uid(i): (store.string(store.txts[i]), store.string(store.fpaths[i])) for i in range(len(store))}
+    for op in mapformat.read_journal(path):
+        if op.get("op") == "block": blocks[op["id"]] = (op["txt"], op["f_path"])
+        elif op.get("op") == "del": blocks.pop(op["id"], None)
+    return [[uid, txt, link_target(path, f) if f else ""] for uid, (txt, f) in blocks.items()]
+
+class WorkspaceIndex:
+    # Block summaries of every map reached so far, keyed by normalised path and persisted as JSON. An entry is
+    # {"stamp": stamp(path), "blocks": scan_map(path)} or, for a map that could not be read, {"stamp", "error"};
+    # a crawl re-parses a map only when its stamp has changed.
+    def __init__(self, path=None):
+        self.path, self.maps, self.lock = path or INDEX_PATH, {}, threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f: data = json.load(f)
+            if data.get("version") == INDEX_VERSION: self.maps = data["maps"]
+        except (OSError, ValueError): pass
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump({"version": INDEX_VERSION, "maps": self.maps}, f)
+        os.replace(tmp, self.path)
+
+    def links(self, path):
+        return [link for _, _, link in self.maps.get(path, {}).get("blocks", ()) if link and is_map(link)]
+
+    def crawl(self, root, workers=WORKERS, progress=None, stop=None):
+        # Breadth-first over .map links from root; the seen set ends cycles. Maps whose stamp still matches are
+        # followed straight from the index, changed ones are parsed in a process pool that is only started if needed.
+        # Returns (reached maps, number parsed).
+        root = norm(root); seen, queue, reached, running, pool, parsed = {root}, deque([root]), [], {}, None, 0
+        try:
+            while queue or running:
+                if stop is not None and stop(): break
+                while queue:
+                    p = queue.popleft(); reached.append(p)
+                    try: st = stamp(p)
+                    except OSError: self.maps.pop(p, None); continue
+                    entry = self.maps.get(p)
+                    if entry is not None and entry["stamp"] == st: queue.extend(self._follow(p, seen)); continue
+                    if pool is None: pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+                    running[pool.submit(scan_map, p)] = (p, st)
+                if running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        p, st = running.pop(fut); parsed += 1
+                        try: self.maps[p] = {"stamp": st, "blocks": fut.result()}
+                        except BrokenProcessPool: raise  # not the map's fault, so nothing is recorded for it
+                        except Exception as e: self.maps[p] = {"stamp": st, "error": str(e)}
+                        queue.extend(self._follow(p, seen))
+                if progress is not None: progress(len(reached) - len(running), len(seen))
+        finally:
+            if pool is not None: pool.shutdown(cancel_futures=True)
+        return [p for p in reached if p in self.maps], parsed
+
+    def _follow(self, path, seen):
+        new = [link for link in self.links(path) if link not in seen]
+        seen.update(new); return new
+
+    def text_index(self, maps):
+        # Cross-map search: one TextIndex whose keys are (map path, block uid)
+        ix = mapsearch.TextIndex()
+        for p in maps:
+            for uid, txt, link in self.maps[p].get("blocks", ()): ix.set((p, uid), txt, os.path.basename(link))
+        return ix
+
+    def broken_links(self, maps):
+        # (map, block uid, block text, link, reason) for links to files that are gone or maps that cannot be read
+        out, exists = [], {}
+        for p in maps:
+            for uid, txt, link in self.maps[p].get("blocks", ()):
+                if not link: continue
+                if link not in exists: exists[link] = os.path.exists(link)
+                if not exists[link]: out.append((p, uid, txt, link, "missing"))
+                elif is_map(link) and "error" in self.maps.get(link, {}): out.append((p, uid, txt, link, "unreadable"))
+        return out
+
+class WorkspaceScan(BackgroundJob):
+    # Crawls on a daemon thread. Once done is set, maps, text and broken hold a snapshot of the workspace that the
+    # GUI can read while later scans update the index; progress is (maps done, maps found).
+    def __init__(self, index, root, workers=WORKERS):
+        super().__init__(); self.index, self.root = index, norm(root)
+        self.maps, self.text, self.broken, self.parsed, self.progress = [], None, [], 0, (0, 1)
+        self.start(workers)
+
+    def run(self, workers):
+        with self.index.lock:
+            self.maps, self.parsed = self.index.crawl(self.root, workers, lambda done, total: setattr(self, "progress", (done, total)), self.stopped)
+            if self.stopped(): return
+            self.text, self.broken = self.index.text_index(self.maps), self.index.broken_links(self.maps)
+            self.index.save()
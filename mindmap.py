@@ -1,10 +1,26 @@
 import sys
-import json
 import random
 import math
 import time
 import os
-import subprocess
+import struct
+import zlib
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import mapformat
+import mapgraph
+import mapsearch
+import mapworkspace
+import mapprofile
+import mapimport
+try:
+    import maplayout
+except ImportError:
+    maplayout = None  # Auto layout needs NumPy
+from mapformat import MAP_EXTS
 
 os.environ["QT_QUICK_BACKEND"] = "software"
 
@@ -13,154 +29,327 @@ try:
     from PyQt6.QtWidgets import (QApplication, QMainWindow, QGraphicsView, QGraphicsScene, 
                                  QGraphicsItem, QGraphicsLineItem, QGraphicsTextItem, 
                                  QGraphicsPathItem, QColorDialog, QDialog, QVBoxLayout, 
-                                 QLabel, QTextEdit, QPushButton, QComboBox, QFileDialog, QHBoxLayout, QRubberBand, QMessageBox)
-    from PyQt6.QtCore import Qt, QPointF, QRectF, QLineF, QPoint, QRect, QSize, QUrl
-    from PyQt6.QtGui import QColor, QPen, QBrush, QPainter, QFont, QPainterPath, QTextOption, QPolygonF, QAction, QKeySequence, QImage, QDesktopServices, QPixmap, QFontMetrics
+                                 QLabel, QTextEdit, QPushButton, QComboBox, QFileDialog, QHBoxLayout, QRubberBand, QMessageBox,
+                                 QStyleOptionGraphicsItem, QProgressDialog, QDockWidget, QWidget, QLineEdit, QListWidget, QCheckBox)
+    from PyQt6.QtCore import Qt, QPointF, QRectF, QLineF, QPoint, QRect, QSize, QUrl, QTimer
+    from PyQt6.QtGui import QColor, QPen, QBrush, QPainter, QFont, QPainterPath, QTextOption, QPolygonF, QAction, QKeySequence, QImage, QDesktopServices, QPixmap, QFontMetrics, QTransform
 except ImportError:
     print("PyQt6 is missing! Please run 'pip install PyQt6'.")
     sys.exit(1)
 
 GRID_SIZE = 30
+GRID_TILE = 32
+GRID_MIN_SPACING = 6
+GRID_MAX_SKIP = 8
+# Level of detail: below LOD_SIMPLE blocks are plain rects and lines lose arrowheads and antialiasing;
+# block text fades out between LOD_TEXT_FULL and LOD_TEXT_HIDE
+LOD_SIMPLE = 0.3
+LOD_TEXT_HIDE, LOD_TEXT_FULL = 0.3, 0.5
+SELECT_COLOR = QColor("#FFD700")
+LINE_WIDTH = 4
+ARROW_SIZE, ARROW_SPACING = 8, 60
+ARROW_CACHE_MAX = 64  # arrowheads a line keeps built; longer lines build only the stretch being painted
+# Blocks of a loaded map become Qt items only once the view comes within this many scene units of them
+MATERIALIZE_MARGIN = 500
+# Journal: pending moves/edits are logged every AUTOSAVE_MS, and the map is rewritten once COMPACT_OPS entries pile up
+AUTOSAVE_MS = 2000
+COMPACT_OPS = 2000
+# Export renders EXPORT_TILE px tiles into one row band at a time; bands are deflated on EXPORT_WORKERS threads
+EXPORT_TILE = 512
+EXPORT_WORKERS = min(4, os.cpu_count() or 1)
+FRAME_MS = 16
+# Scene bounds start at SCENE_MIN and only grow, to SCENE_MARGIN past whatever leaves them, so the BSP index keeps
+# covering every item; items outside the scene rect all land in its edge leaves and every lookup scans them
+SCENE_MIN = (0, 0, 10000, 10000)
+SCENE_MARGIN = 2000
+# Spatial index used outside suspend_index/resume_index. Qt's automatic BSP depth (0) grows with the item count, to
+# ~18 at 100k items, where a long connection spans thousands of leaves and every move of it rewrites them all; a
+# fixed depth of 10 kept lookups around a millisecond from 1k to 100k items
+SCENE_INDEX = QGraphicsScene.ItemIndexMethod.BspTreeIndex
+BSP_DEPTH = 10
+# Dragging at least this share of a map's blocks suspends the index until the drop; below it the index is cheaper
+# to update than unindexed repaints are to scan
+DRAG_UNINDEX = 0.3
+# Hit-testing maps no items through a device transform, so every lookup shares this one
+IDENTITY = QTransform()
+
+# Auto layout: positions from the worker thread are eased onto the blocks every LAYOUT_TICK_MS
+LAYOUT_TICK_MS = 40
+# Search lists and highlights at most SEARCH_LIMIT blocks; picking one zooms in to at least SEARCH_ZOOM
+SEARCH_LIMIT = 200
+SEARCH_ZOOM = 1.0
+# Parsed maps shared by every window, so going back up a sub-map trail does not re-read the file
+MAP_CACHE = mapformat.MapCache()
+WORKSPACE = None  # mapworkspace.WorkspaceIndex shared by all windows, read from disk on first use
+# Instrumentation: MINDMAP_PROFILE=1 turns it on at start-up, MINDMAP_PROFILE=trace.json also writes the trace on exit
+PROFILE_ENV = "MINDMAP_PROFILE"
+PROFILER = None  # mapprofile.Profiler while instrumentation is on
+HUD_REFRESH = 0.25
+WORKSPACE_POLL_MS = 200
+# Bulk import: found files are added for at most IMPORT_TICK_MS per event-loop tick, in rows up to IMPORT_ROW_W wide,
+# a new row for every folder. Files with a preview get blocks PREVIEW_H tall with the name at the bottom.
+IMPORT_TICK_MS = 8
+IMPORT_ROW_W = 2400
+PREVIEW_H = 150
+# Thumbnails are drawn, and so only made, for blocks painted at THUMB_LOD or closer; results are picked up every PREVIEW_POLL_MS
+THUMB_LOD = 0.5
+PREVIEW_POLL_MS = 100
+PREVIEWS = mapimport.Previews()  # thumbnails and file checks shared by all windows
+BROKEN_COLOR = QColor("#E53935")
+
+FILE_ICONS = {ext: icon for icon, exts in [("📕", ".pdf"), ("📊", ".xls .xlsx .csv"), ("📝", ".doc .docx .rtf"), ("📉", ".ppt .pptx"),
+                                           ("📃", ".txt .md"), ("🗺️", " ".join(MAP_EXTS)), ("🎵", ".mp3 .wav .ogg .flac"), ("🎬", ".mp4 .mov .avi .mkv"),
+                                           ("💻", ".py .js .html .css .json .xml"), ("📦", ".zip .rar .7z"), ("🎨", ".svg .psd .ai")] for ext in exts.split()}
+DEFAULT_ICON = "📄"
+# Blocks share font metrics, text options, outline paths and measured text heights; the caches are dropped wholesale past LAYOUT_CACHE entries
+LAYOUT_CACHE = 4096
+_metrics, _options, _paths, _heights = {}, {}, {}, {}
+
+def font_metrics(font, key):
+    fm = _metrics.get(key)
+    if fm is None: fm = _metrics[key] = QFontMetrics(font)
+    return fm
+
+def text_option(h_align):
+    opt = _options.get(h_align)
+    if opt is None:
+        opt = _options[h_align] = QTextOption(); opt.setAlignment([Qt.AlignmentFlag.AlignLeft, Qt.AlignmentFlag.AlignHCenter, Qt.AlignmentFlag.AlignRight][h_align])
+    return opt
+
+def block_path(w, h):
+    path = _paths.get((w, h))
+    if path is None:
+        if len(_paths) > LAYOUT_CACHE: _paths.clear()
+        path = _paths[(w, h)] = QPainterPath(); path.addRoundedRect(QRectF(0, 0, w, h), 10, 10)
+    return path
+
+def text_height(item, text, font_key, width):
+    key = (text, font_key, width); th = _heights.get(key)
+    if th is None:
+        if len(_heights) > LAYOUT_CACHE: _heights.clear()
+        th = _heights[key] = item.boundingRect().height()
+    return th
 
 class ConnectionLine(QGraphicsLineItem):
+    # Hit-testing and selection proxy; the scene's EdgeLayer does the painting in batches
     def __init__(self, block1, block2, color="#aaaaaa", style=Qt.PenStyle.SolidLine, is_directed=False):
         super().__init__()
         self.block1, self.block2 = block1, block2
-        self.line_color, self.line_style, self.is_directed = QColor(color), style, is_directed
+        self.line_color, self.line_style, self.is_directed = QColor(color), style, is_directed; self.arrows = None
         self.setZValue(-1)
-        self.setFlags(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable)
+        self.setFlags(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable | QGraphicsItem.GraphicsItemFlag.ItemHasNoContents)
         self.update_appearance()
         self.update_position()
 
+    def refresh(self):
+        if self.scene(): self.scene().update(self.sceneBoundingRect())
+
     def update_appearance(self):
-        self.setPen(QPen(self.line_color, 4, self.line_style))
+        self.setPen(QPen(self.line_color, LINE_WIDTH, self.line_style)); self.refresh()
 
-    def update_position(self):
+    def update_position(self, refresh=True):
+        # Layout ticks pass refresh=False: they repaint the scene once and leave the arrowheads to be built when painted
         if self.block1 and self.block2 and self.block1.scene() and self.block2.scene():
             p1 = self.block1.scenePos() + self.block1.get_center_offset()
             p2 = self.block2.scenePos() + self.block2.get_center_offset()
-            self.setLine(QLineF(p1, p2))
-            self.prepareGeometryChange()
-            self.update()
+            if refresh: self.refresh()
+            self.setLine(QLineF(p1, p2)); self.arrows = self.build_arrows() if refresh and self.arrow_count() <= ARROW_CACHE_MAX else None
+            if refresh: self.refresh()
 
-    def paint(self, painter, option, widget):
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        painter.setPen(self.pen())
-        line = self.line()
-        painter.drawLine(line)
-        if self.is_directed and line.length() > 30:
-            angle = math.atan2(-line.dy(), line.dx())
-            painter.setBrush(QBrush(self.line_color))
-            painter.setPen(Qt.PenStyle.NoPen)
-            for i in range(1, int(line.length() / 60) + 1):
-                pos = line.pointAt((i * 60) / line.length())
-                if (i * 60) / line.length() > 0.9: continue
-                p1 = pos + QPointF(math.sin(angle - math.pi/3) * 8, math.cos(angle - math.pi/3) * 8)
-                p2 = pos + QPointF(math.sin(angle - math.pi + math.pi/3) * 8, math.cos(angle - math.pi + math.pi/3) * 8)
-                painter.drawPolygon(QPolygonF([pos, p1, p2]))
+    def arrow_count(self):
+        length = self.line().length()
+        return int(length * 0.9 / ARROW_SPACING) if self.is_directed and length > 30 else 0
+
+    def build_arrows(self, first=1, last=None):
+        # Arrowheads first..last along the line, counted from its start
+        arrows, line = [], self.line()
+        length = line.length(); last = self.arrow_count() if last is None else last
+        if first > last: return arrows
+        x1, y1, dx, dy = line.x1(), line.y1(), line.dx(), line.dy()
+        angle = math.atan2(-dy, dx)
+        ax1, ay1 = math.sin(angle - math.pi/3) * ARROW_SIZE, math.cos(angle - math.pi/3) * ARROW_SIZE
+        ax2, ay2 = math.sin(angle - math.pi + math.pi/3) * ARROW_SIZE, math.cos(angle - math.pi + math.pi/3) * ARROW_SIZE
+        ux, uy = dx / length * ARROW_SPACING, dy / length * ARROW_SPACING
+        for i in range(first, last + 1):
+            x, y = x1 + ux * i, y1 + uy * i
+            arrows.append(QPolygonF([QPointF(x, y), QPointF(x + ax1, y + ay1), QPointF(x + ax2, y + ay2)]))
+        return arrows
+
+    def arrows_in(self, r):
+        # The arrowheads whose tips fall inside r. They are evenly spaced, so clipping a cached list is a slice of it;
+        # a line too long to cache builds just that stretch, so it costs what its visible part costs
+        n = self.arrow_count()
+        if not n: return []
+        line = self.line(); length = line.length()
+        x1, y1, dx, dy = line.x1(), line.y1(), line.dx(), line.dy()
+        t0, t1 = 0.0, 1.0; r = r.adjusted(-ARROW_SIZE, -ARROW_SIZE, ARROW_SIZE, ARROW_SIZE)
+        for p, q in ((-dx, x1 - r.left()), (dx, r.right() - x1), (-dy, y1 - r.top()), (dy, r.bottom() - y1)):
+            if p == 0:
+                if q < 0: return []
+            elif p < 0: t0 = max(t0, q / p)
+            else: t1 = min(t1, q / p)
+        if t0 > t1: return []
+        first, last = max(1, math.ceil(t0 * length / ARROW_SPACING)), min(n, int(t1 * length / ARROW_SPACING))
+        if n > ARROW_CACHE_MAX: return self.build_arrows(first, last)
+        if self.arrows is None: self.arrows = self.build_arrows()
+        return self.arrows[first - 1:last]
+
+    def boundingRect(self):
+        r = super().boundingRect()
+        return r.adjusted(-ARROW_SIZE, -ARROW_SIZE, ARROW_SIZE, ARROW_SIZE) if self.is_directed else r
+
+    def to_record(self):
+        return {"b1": self.block1.uid, "b2": self.block2.uid, "c": self.line_color.name(), "s": int(self.line_style.value), "dir": self.is_directed}
 
     def remove_self(self):
-        if self.block1 and self in self.block1.connections: self.block1.connections.remove(self)
-        if self.block2 and self in self.block2.connections: self.block2.connections.remove(self)
-        if self.scene(): self.scene().removeItem(self)
+        if self.scene(): self.scene().remove_lines([self])
+
+class EdgeLayer:
+    # Paints every ConnectionLine that intersects the exposed rect: one stroke per colour/style, arrowheads grouped by colour.
+    # Arrowheads stay separate polygons since filling one merged path is several times slower in the raster engine
+    def __init__(self, scene): self.scene = scene; self._pens = {}
+
+    def pen(self, rgba, style):
+        pen = self._pens.get((rgba, style))
+        if pen is None: pen = self._pens[(rgba, style)] = QPen(QColor.fromRgba(rgba), LINE_WIDTH, style)
+        return pen
+
+    def paint(self, p, r):
+        detailed = QStyleOptionGraphicsItem.levelOfDetailFromTransform(p.worldTransform()) >= LOD_SIMPLE
+        strokes, arrows = {}, {}
+        for it in self.scene.items(r, Qt.ItemSelectionMode.IntersectsItemBoundingRect, Qt.SortOrder.AscendingOrder):
+            if not isinstance(it, ConnectionLine): continue
+            rgba = it.line_color.rgba(); key = (rgba, it.line_style)
+            path = strokes.get(key)
+            if path is None: path = strokes[key] = QPainterPath()
+            line = it.line(); path.moveTo(line.p1()); path.lineTo(line.p2())
+            if detailed and it.is_directed:
+                polys = arrows.get(rgba)
+                if polys is None: polys = arrows[rgba] = []
+                polys.extend(it.arrows_in(r))
+        if not strokes: return
+        p.save(); p.setRenderHint(QPainter.RenderHint.Antialiasing, detailed); p.setBrush(Qt.BrushStyle.NoBrush)
+        for (rgba, style), path in strokes.items(): p.strokePath(path, self.pen(rgba, style))
+        p.setPen(Qt.PenStyle.NoPen)
+        for rgba, polys in arrows.items():
+            p.setBrush(QColor.fromRgba(rgba))
+            for poly in polys: p.drawPolygon(poly)
+        p.restore()
 
 class MindBlock(QGraphicsPathItem):
     def __init__(self, x, y, scene_mgr, text="New Idea", b_color="#4A90E2", t_color="#FFFFFF", h_align=1, v_align=1, uid=None, width=190, height=40, file_path=""):
         super().__init__()
-        self.scene_mgr, self.uid = scene_mgr, uid if uid else str(random.randint(1000000, 9999999))
+        self.scene_mgr, self.uid = scene_mgr, uid if uid else scene_mgr.new_uid()
         self.brush_color, self.text_color = QColor(b_color), QColor(t_color)
         self.h_alignment, self.v_alignment = h_align, v_align
         self.setPos(x, y)
         self.w, self.h = width, height
         self.file_path = file_path
+        self.store_index = None
         
         self.is_manually_selected = False
-        self._is_moving_group = False
         
         self.setFlags(QGraphicsItem.GraphicsItemFlag.ItemIsMovable | 
                       QGraphicsItem.GraphicsItemFlag.ItemIsSelectable |
                       QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
         
         self.text_item = QGraphicsTextItem(self)
-        self.connections = []
+        self.text_item.setOpacity(scene_mgr.text_opacity); self.text_item.setVisible(scene_mgr.text_opacity > 0)
         self.press_time = 0
+        self._layout_key = self._align = None
         self.update_content(text)
 
     def get_center_offset(self): return QPointF(self.w / 2, self.h / 2)
 
+    @property
+    def connections(self): return self.scene_mgr.graph.edges_of(self.uid)
+
+    def apply_record(self, r):
+        self.setPos(r["x"], r["y"]); self.w, self.h = r["w"], r["h"]
+        self.brush_color, self.text_color = QColor(r["bc"]), QColor(r["tc"])
+        self.h_alignment, self.v_alignment, self.file_path = r["ha"], r["va"], r["f_path"]
+        self.update_content(r["txt"]); self.update(); self.scene_mgr.grow_to(self.sceneBoundingRect())
+
+    def to_record(self):
+        return {"x": self.x(), "y": self.y(), "txt": self.text_item.toPlainText(), "bc": self.brush_color.name(), "tc": self.text_color.name(),
+                "ha": self.h_alignment, "va": self.v_alignment, "id": self.uid, "w": self.w, "h": self.h, "f_path": self.file_path}
+
     def update_content(self, text):
         display_text = text
         if self.file_path:
-            ext = os.path.splitext(self.file_path)[1].lower()
-            icon = "📄"
-            if ext in ['.pdf']: icon = "📕"
-            elif ext in ['.xls', '.xlsx', '.csv']: icon = "📊"
-            elif ext in ['.doc', '.docx', '.rtf']: icon = "📝"
-            elif ext in ['.ppt', '.pptx']: icon = "📉"
-            elif ext in ['.txt', '.md']: icon = "📃"
-            elif ext in ['.map']: icon = "🗺️"
-            elif ext in ['.mp3', '.wav', '.ogg', '.flac']: icon = "🎵"
-            elif ext in ['.mp4', '.mov', '.avi', '.mkv']: icon = "🎬"
-            elif ext in ['.py', '.js', '.html', '.css', '.json', '.xml']: icon = "💻"
-            elif ext in ['.zip', '.rar', '.7z']: icon = "📦"
-            elif ext in ['.svg', '.psd', '.ai']: icon = "🎨"
-            
+            icon = FILE_ICONS.get(os.path.splitext(self.file_path)[1].lower(), DEFAULT_ICON)
             if text == "New Idea" or not text:
                 display_text = f"{icon} {os.path.basename(self.file_path)}"
             elif not text.startswith(icon):
                 display_text = f"{icon} {text}"
+        self.scene_mgr.index_block(self, display_text)
 
-        self.text_item.setPlainText(display_text)
-        self.text_item.setDefaultTextColor(self.text_color)
-        
+        font = self.text_item.font(); fkey = font.key(); fm = font_metrics(font, fkey)
         # Auto-Resize Logic
-        fm = QFontMetrics(self.text_item.font())
-        text_width = fm.horizontalAdvance(display_text)
-        
         if self.file_path:
-            self.w = max(190, text_width + 40)
+            self.w = max(190, fm.horizontalAdvance(display_text) + 40)
         else:
             self.w = max(self.w, 40)
 
-        self.text_item.setTextWidth(max(10, self.w - 20))
-        
-        opt = QTextOption()
-        opt.setAlignment([Qt.AlignmentFlag.AlignLeft, Qt.AlignmentFlag.AlignHCenter, Qt.AlignmentFlag.AlignRight][self.h_alignment])
-        self.text_item.document().setDefaultTextOption(opt)
-        th = self.text_item.boundingRect().height()
+        key = (display_text, fkey, self.text_color.rgba(), self.brush_color.rgba(), self.w, self.h, self.h_alignment, self.v_alignment)
+        if key == self._layout_key: return
+        self._layout_key = key
+        # Alignment and width go in before the text so the document is laid out once, with its final settings
+        doc, tw = self.text_item.document(), max(10, self.w - 20)
+        if self._align != self.h_alignment: doc.setDefaultTextOption(text_option(self.h_alignment)); self._align = self.h_alignment
+        if doc.textWidth() != tw: self.text_item.setTextWidth(tw)
+        if doc.toPlainText() != display_text: self.text_item.setPlainText(display_text)
+        self.text_item.setDefaultTextColor(self.text_color)
+
+        th = text_height(self.text_item, display_text, fkey, tw)
         y_pos = (self.h - th) / 2 if self.v_alignment == 1 else (10 if self.v_alignment == 0 else self.h - th - 5)
         self.text_item.setPos(10, max(0, y_pos))
-        
-        path = QPainterPath()
-        path.addRoundedRect(QRectF(0, 0, self.w, self.h), 10, 10)
-        self.setPath(path)
+
+        self.setPath(block_path(self.w, self.h))
         self.setBrush(QBrush(self.brush_color))
-        
-        for connection in self.connections:
-            connection.update_position()
+        if self.scene(): self.scene_mgr.mark_lines_dirty(self.connections)
+
+    def resize_to(self, w, h):
+        # The outline follows the mouse at once and the lines once per event-loop tick; only the text relayout waits for
+        # the next frame
+        self.w, self.h = max(50, w), max(30, h); self.setPath(block_path(self.w, self.h))
+        self.scene_mgr.grow_to(QRectF(self.x(), self.y(), self.w, self.h)); self.scene_mgr.mark_lines_dirty(self.connections)
+        self.scene_mgr.queue_relayout(self); self.scene_mgr.touch(self)
 
     def paint(self, painter, option, widget):
-        pen = QPen(QColor("#FFD700") if self.is_manually_selected else Qt.GlobalColor.black, 3 if self.is_manually_selected else 1)
+        if option.levelOfDetailFromTransform(painter.worldTransform()) < LOD_SIMPLE:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing, False)
+            painter.fillRect(QRectF(0, 0, self.w, self.h), SELECT_COLOR if self.is_manually_selected else self.brush_color); return
+        # A linked file that is gone gets a dashed red outline; the check runs on a pool thread the first time it is painted
+        if self.file_path: self.scene_mgr.watch_previews()
+        broken = bool(self.file_path) and PREVIEWS.link_ok(self.file_path) is False
+        if self.is_manually_selected: pen = QPen(SELECT_COLOR, 3)
+        elif broken: pen = QPen(BROKEN_COLOR, 3, Qt.PenStyle.DashLine)
+        else: pen = QPen(Qt.GlobalColor.black, 1)
         self.setPen(pen)
         super().paint(painter, option, widget)
+        if self.file_path:
+            room = QRectF(10, 8, self.w - 20, self.text_item.y() - 14)
+            if room.height() >= 24 and not broken and option.levelOfDetailFromTransform(painter.worldTransform()) >= THUMB_LOD and mapimport.has_thumb(self.file_path):
+                self.scene_mgr.painted_thumbs[self.uid] = (self.file_path, QRectF(self.x(), self.y(), self.w, self.h))
+                img = PREVIEWS.thumbnail(self.file_path)
+                if img is not None:
+                    s = img.size().scaled(room.size().toSize(), Qt.AspectRatioMode.KeepAspectRatio)
+                    painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+                    painter.drawImage(QRectF(room.center().x() - s.width() / 2, room.center().y() - s.height() / 2, s.width(), s.height()), img)
 
     def itemChange(self, change, value):
         if change == QGraphicsItem.GraphicsItemChange.ItemPositionChange and self.scene():
+            if self.scene_mgr.moving_group: return value
             if self.scene_mgr.parent.is_global_resize_mode: return self.pos()
             new_pos = value
             if self.scene_mgr.parent.snap_to_grid:
                 new_pos = QPointF(round(new_pos.x()/GRID_SIZE)*GRID_SIZE, round(new_pos.y()/GRID_SIZE)*GRID_SIZE)
             
-            offset = new_pos - self.pos()
-            if self.is_manually_selected and not self._is_moving_group and offset != QPointF(0,0):
-                self._is_moving_group = True
-                for item in self.scene().items():
-                    if isinstance(item, MindBlock) and item.is_manually_selected and item != self:
-                        item._is_moving_group = True
-                        item.setPos(item.pos() + offset)
-                        item._is_moving_group = False
-                self._is_moving_group = False
-            for l in self.connections: l.update_position()
+            offset = new_pos - self.pos(); self.scene_mgr.grow_to(QRectF(new_pos.x(), new_pos.y(), self.w, self.h))
+            if self.is_manually_selected and offset != QPointF(0,0):
+                self.scene_mgr.move_selection(offset, self)
+            self.scene_mgr.mark_lines_dirty(self.connections); self.scene_mgr.touch(self)
             return new_pos
         return super().itemChange(change, value)
 
@@ -173,8 +362,8 @@ class MindBlock(QGraphicsPathItem):
             self.scene_mgr.start_connection(self, directed=is_dir)
             event.accept(); return
         if event.button() == Qt.MouseButton.LeftButton and event.modifiers() == Qt.KeyboardModifier.ShiftModifier:
-            self.is_manually_selected = not self.is_manually_selected
-            self.update(); event.accept(); return
+            self.scene_mgr.set_manual_selection(self, not self.is_manually_selected)
+            event.accept(); return
         super().mousePressEvent(event)
 
     def mouseMoveEvent(self, event):
@@ -184,10 +373,7 @@ class MindBlock(QGraphicsPathItem):
             if self.scene_mgr.parent.snap_to_grid:
                 new_w = round(new_w / GRID_SIZE) * GRID_SIZE
                 new_h = round(new_h / GRID_SIZE) * GRID_SIZE
-            self.w = max(50, new_w)
-            self.h = max(30, new_h)
-            self.update_content(self.text_item.toPlainText())
-            for l in self.connections: l.update_position()
+            self.resize_to(new_w, new_h)
             return
         super().mouseMoveEvent(event)
 
@@ -196,24 +382,22 @@ class MindBlock(QGraphicsPathItem):
             if (time.time() - self.press_time) < 0.2 and not (event.modifiers() & Qt.KeyboardModifier.ShiftModifier):
                 self.open_editor()
         super().mouseReleaseEvent(event)
+        self.scene_mgr.end_drag(); self.scene_mgr.flush_relayout(); self.scene_mgr.commit_changes()
 
     def mouseDoubleClickEvent(self, event):
         if self.file_path and os.path.exists(self.file_path):
-            if self.file_path.endswith('.map'):
-                self.open_sub_map()
+            if os.path.splitext(self.file_path)[1].lower() in MAP_EXTS:
+                self.open_sub_map(bool(event.modifiers() & Qt.KeyboardModifier.ControlModifier))
             else:
                 QDesktopServices.openUrl(QUrl.fromLocalFile(self.file_path))
         else:
             super().mouseDoubleClickEvent(event)
 
-    def open_sub_map(self):
-        try:
-            subprocess.Popen([sys.executable, sys.argv[0], self.file_path])
-        except Exception as e:
-            print(f"Error opening map: {e}")
+    def open_sub_map(self, new_window=False):
+        self.scene_mgr.parent.open_sub_map(self.file_path, new_window)
 
     def open_editor(self):
-        selected_blocks = [i for i in self.scene().items() if isinstance(i, MindBlock) and i.is_manually_selected]
+        selected_blocks = list(self.scene_mgr.selected_blocks)
         if self not in selected_blocks: selected_blocks.append(self)
         d = QDialog(); d.setWindowTitle("Edit Block"); d.setMinimumSize(350, 480); layout = QVBoxLayout(d)
         
@@ -228,7 +412,7 @@ class MindBlock(QGraphicsPathItem):
         temp_path = self.file_path
         def sel_file():
             nonlocal temp_path
-            filters = "All Supported (*.pdf *.txt *.docx *.xlsx *.pptx *.map *.mp3 *.wav *.mp4 *.py *.html *.css *.js *.json *.zip *.rar);;All Files (*.*)"
+            filters = "All Supported (*.pdf *.txt *.docx *.xlsx *.pptx *.map *.mapb *.mp3 *.wav *.mp4 *.py *.html *.css *.js *.json *.zip *.rar);;All Files (*.*)"
             p, _ = QFileDialog.getOpenFileName(d, "Select File", "", filters)
             if p: temp_path = p; f_lbl.setText(f"Selected: {os.path.basename(p)}")
         btn_file.clicked.connect(sel_file)
@@ -259,19 +443,67 @@ class MindBlock(QGraphicsPathItem):
                 block.file_path = temp_path
                 txt = edit.toPlainText() if len(selected_blocks) == 1 else block.text_item.toPlainText()
                 block.update_content(txt)
-                block.update()
+                block.update(); self.scene_mgr.touch(block)
 
 class CustomView(QGraphicsView):
     def __init__(self, scene):
         super().__init__(scene); self.setRenderHint(QPainter.RenderHint.Antialiasing)
         self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
         self._panning = self._selecting = False; self.rubberBand = QRubberBand(QRubberBand.Shape.Rectangle, self); self.origin = QPoint()
+        self.hud = None; self._hud_at = 0.0; self.setAcceptDrops(True)
 
     def wheelEvent(self, e):
         f_in, f_out = 1.15, 0.85
         curr = self.transform().m11()
         if e.angleDelta().y() > 0 and curr < 5.0: self.scale(f_in, f_in)
         elif e.angleDelta().y() < 0 and curr > 0.15: self.scale(f_out, f_out)
+        self.scene().set_detail(self.transform().m11()); self.sync_visible()
+
+    def sync_visible(self):
+        if self.scene() is not None: self.scene().materialize_rect(self.mapToScene(self.viewport().rect()).boundingRect())
+
+    def scrollContentsBy(self, dx, dy): super().scrollContentsBy(dx, dy); self.sync_visible()
+
+    def resizeEvent(self, e): super().resizeEvent(e); self.sync_visible()
+
+    def paintEvent(self, e):
+        # sip settles whether a Python paintEvent exists when the view is built, so unlike the other hooks this one
+        # cannot be wrapped in later; with profiling off it costs one check per frame
+        if PROFILER is None: return super().paintEvent(e)
+        t = time.perf_counter(); super().paintEvent(e); t1 = time.perf_counter()
+        PROFILER.end_frame(t, t1)
+        if self.hud is not None and t1 - self._hud_at >= HUD_REFRESH: self._hud_at = t1; self.update_hud(t1)
+
+    def show_hud(self, on):
+        # A child of the view rather than paint on the viewport, so scrolling never drags stale HUD pixels along
+        if self.hud is None:
+            if not on: return
+            self.hud = QLabel(self); self.hud.setAutoFillBackground(True); self.hud.move(8, 8)
+            self.hud.setStyleSheet("background-color: #202020; color: #e0e0e0; font-family: monospace; padding: 4px;")
+            self.hud.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.hud.setVisible(on); self._hud_at = 0.0
+        if on: self.hud.setText("waiting for a frame..."); self.hud.adjustSize(); self.hud.raise_(); self.viewport().update()
+
+    def update_hud(self, now):
+        p = PROFILER; last = p.last_frame
+        lines = [f"FPS {p.fps(now):3d}   frame {p.frames[-1][1] * 1000:6.1f} ms",
+                 f"blocks painted {last.get('MindBlock.paint', 0)}   lines updated {last.get('ConnectionLine.update_position', 0)}"]
+        lines += [f"{key:<30}{calls:>8}{total * 1000:>10.1f} ms" for key, calls, total in p.top(4)]
+        self.hud.setText("\n".join(lines)); self.hud.adjustSize()
+
+    def dragEnterEvent(self, e):
+        if e.mimeData().hasUrls(): e.acceptProposedAction()
+        else: super().dragEnterEvent(e)
+
+    def dragMoveEvent(self, e):
+        if e.mimeData().hasUrls(): e.acceptProposedAction()
+        else: super().dragMoveEvent(e)
+
+    def dropEvent(self, e):
+        # Dropped files and folders go through the same bulk import as File > Import, starting where they were dropped
+        paths = [u.toLocalFile() for u in e.mimeData().urls() if u.isLocalFile()]
+        if not paths: super().dropEvent(e); return
+        e.acceptProposedAction(); self.scene().parent.import_paths(paths, self.mapToScene(e.position().toPoint()))
 
     def mousePressEvent(self, e):
         it = self.itemAt(e.position().toPoint())
@@ -290,69 +522,406 @@ class CustomView(QGraphicsView):
     def mouseReleaseEvent(self, e):
         if self._selecting:
             self.rubberBand.hide(); rect = self.mapToScene(self.rubberBand.geometry()).boundingRect()
-            for i in self.scene().items(rect): (setattr(i, 'is_manually_selected', True), i.update()) if isinstance(i, MindBlock) else None
+            hits = self.scene().items(rect, Qt.ItemSelectionMode.IntersectsItemBoundingRect)
+            self.scene().set_manual_selection([i for i in hits if isinstance(i, MindBlock)], True)
             self._selecting = False; return
         if e.button() == Qt.MouseButton.MiddleButton: self._panning = False; self.setCursor(Qt.CursorShape.ArrowCursor)
         super().mouseReleaseEvent(e)
 
 class MindMapScene(QGraphicsScene):
     def __init__(self, parent):
-        super().__init__(); self.parent = parent; self.setSceneRect(0, 0, 10000, 10000); self.src = None
+        super().__init__(); self.parent = parent; self.setSceneRect(QRectF(*SCENE_MIN)); self.src = None
+        self._index_paused = 0; self._drag_unindexed = False; self.set_index(SCENE_INDEX, BSP_DEPTH)
+        self.grid_pen = QPen(QColor("#555555"), 1); self._grid_tiles = {}
+        self.selected_blocks = set(); self.moving_group = False; self.text_opacity = 1.0
+        self.edges = EdgeLayer(self)
+        self._dirty_lines = set(); self._flush_queued = False
+        # Timers call through lambdas so the methods are looked up per tick and the profiler's wrappers, installed later, are seen
+        self._relayout = set(); self._relayout_timer = QTimer(); self._relayout_timer.setSingleShot(True)
+        self._relayout_timer.setInterval(FRAME_MS); self._relayout_timer.timeout.connect(lambda: self.flush_relayout())
+        self.blocks = {}; self.graph = mapgraph.MapGraph(); self.store = self.pending = self.edge_state = None; self.loaded_chunks = set()
+        self.journal = None; self._touched = set(); self.text_index = None
+        self.newly_materialized = None  # store indices materialized since an export started tracking them
+        self.layout_run = self.layout_blocks = None; self.layout_timer = QTimer(); self.layout_timer.setInterval(LAYOUT_TICK_MS)
+        self.layout_timer.timeout.connect(lambda: self.step_layout())
+        self.preview_timer = QTimer(); self.preview_timer.setInterval(PREVIEW_POLL_MS); self.preview_timer.timeout.connect(self.poll_previews)
+        self.painted_thumbs, self.shown_thumbs, self.pinned = {}, {}, set()  # uid -> (file, block rect) this frame and while on screen
+
+    def clear(self):
+        self.stop_layout(False); self.selected_blocks.clear(); self._dirty_lines.clear(); self._touched.clear(); self._relayout.clear(); self.src = None
+        self.blocks.clear(); self.graph.clear(); self.store = self.pending = self.edge_state = None; self.loaded_chunks.clear()
+        self.text_index = None; super().clear(); self.setSceneRect(QRectF(*SCENE_MIN))
+
+    def add_block(self, b, record=True):
+        # A block whose uid another block already holds gets a fresh one rather than replacing it in self.blocks
+        if self.uid_taken(b.uid, b): b.uid = self.new_uid(); self.index_block(b, b.text_item.toPlainText())
+        self.addItem(b); self.blocks[b.uid] = b; self.grow_to(b.sceneBoundingRect())
+        if record: self.log("block", **b.to_record())
+        return b
+
+    def block_from_record(self, r):
+        return MindBlock(r["x"], r["y"], self, r["txt"], r["bc"], r["tc"], r["ha"], r["va"], r["id"], r["w"], r["h"], r["f_path"])
+
+    def uid_taken(self, uid, b=None):
+        other = self.blocks.get(uid)
+        if other is not None: return other is not b
+        i = self.store.index_of(uid) if self.store is not None else None
+        return i is not None and (b is None or i != b.store_index)
+
+    def new_uid(self):
+        # Seven random digits, drawn again on a clash: a bulk import of a few thousand files would otherwise hit one
+        while True:
+            uid = str(random.randint(1000000, 9999999))
+            if not self.uid_taken(uid): return uid
+
+    def block_by_uid(self, uid):
+        b = self.blocks.get(uid)
+        if b is None and self.store is not None:
+            i = self.store.index_of(uid)
+            if i is not None and self.pending[i]: b = self.materialize_block(i)
+        return b
+
+    # Search: the index is built on the first query, from store records and live blocks alike, and from then on is
+    # kept current by update_content and delete_blocks
+    def index_block(self, b, text):
+        # A block built with a uid that is already taken is indexed once add_block has given it its own
+        if self.text_index is not None and not self.uid_taken(b.uid, b): self.text_index.set(b.uid, text, os.path.basename(b.file_path))
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        if self.text_index is None:
+            ix = self.text_index = mapsearch.TextIndex(); s = self.store
+            for i in range(len(s) if s is not None else 0):
+                if self.pending[i]: ix.set(s.uid(i), s.string(s.txts[i]), os.path.basename(s.string(s.fpaths[i])))
+            for b in self.blocks.values(): ix.set(b.uid, b.text_item.toPlainText(), os.path.basename(b.file_path))
+        return self.text_index.search(query, limit)
+
+    # Journal: every change is an idempotent upsert or delete, so replaying a journal twice is harmless
+    def log(self, op, **fields):
+        if self.journal is not None: self.journal.record(op, **fields)
+
+    def touch(self, b):
+        if self.journal is not None: self._touched.add(b)
+
+    def commit_changes(self):
+        touched, self._touched = self._touched, set()
+        for b in touched:
+            if self.blocks.get(b.uid) is b: self.log("block", **b.to_record())
+
+    def apply_op(self, op):
+        kind = op.get("op")
+        if kind == "block":
+            b = self.block_by_uid(op["id"])
+            if b is None: self.add_block(self.block_from_record(op), record=False)
+            else:
+                self.moving_group = True
+                try: b.apply_record(op)
+                finally: self.moving_group = False
+        elif kind == "del":
+            b = self.block_by_uid(op["id"])
+            if b is not None: self.delete_blocks([b], heal=False)
+        elif kind in ("link", "unlink"):
+            b1, b2 = self.block_by_uid(op["b1"]), self.block_by_uid(op["b2"])
+            if b1 is None or b2 is None: return
+            self.materialize_neighbors(b1)
+            line = self.graph.edge(b1.uid, b2.uid)
+            if kind == "unlink":
+                if line is not None: line.remove_self()
+            elif line is None: self.add_connection(b1, b2, op["c"], Qt.PenStyle(op["s"]), op["dir"], record=False)
+            else: line.line_color, line.line_style = QColor(op["c"]), Qt.PenStyle(op["s"]); line.update_appearance()
+        elif kind == "bg": self.parent.set_bg(op["c"])
+
+    def attach_store(self, store):
+        # Records stay in the store until materialize_rect reaches them; pending/edge_state track what became Qt items
+        self.clear(); self.store = store
+        if len(store): x0, y0, x1, y1 = store.bounds(); self.grow_to(QRectF(x0, y0, x1 - x0, y1 - y0))
+        self.pending = bytearray(b"\x01") * len(store); self.edge_state = bytearray(store.edge_count())
+        for e in store.long_edges: self.materialize_edge(e)
+
+    def materialize_rect(self, rect):
+        if self.store is None: return
+        m = MATERIALIZE_MARGIN
+        for key in self.store.chunks_in(rect.left() - m, rect.top() - m, rect.right() + m, rect.bottom() + m):
+            if key in self.loaded_chunks: continue
+            self.loaded_chunks.add(key)
+            for i in self.store.chunk_blocks(key): self.materialize_block(i)
+            for e in self.store.chunk_edges(key): self.materialize_edge(e)
+
+    def materialize_all(self):
+        if self.store is None: return
+        for i in range(len(self.store)): self.materialize_block(i)
+        self.loaded_chunks.update(self.store.chunks)
+
+    def materialize_block(self, i):
+        if not self.pending[i]: return self.blocks.get(self.store.uid(i))
+        self.pending[i] = 0; r = self.store.record(i)
+        if self.newly_materialized is not None: self.newly_materialized.append(i)
+        b = self.block_from_record(r); b.store_index = i; self.add_block(b, record=False)
+        for e in self.store.edges_of(i):
+            other = self.store.e2[e] if self.store.e1[e] == i else self.store.e1[e]
+            if not self.edge_state[e] and not self.pending[other]: self.materialize_edge(e)
+        return b
+
+    def materialize_edge(self, e):
+        if self.edge_state[e]: return
+        s = self.store; b1, b2 = self.materialize_block(s.e1[e]), self.materialize_block(s.e2[e])
+        if self.edge_state[e]: return
+        self.edge_state[e] = 1
+        if b1 and b2: self.add_connection(b1, b2, mapformat.color_name(s.ecs[e]), Qt.PenStyle(s.ess[e]), bool(s.eds[e]), record=False)
+
+    def release_blocks(self, indices):
+        # Store blocks that were materialized only to be drawn go back to being records. Nothing about them has
+        # changed, so nothing is logged. Their chunks, and every chunk one of their lines crosses, are marked unloaded
+        # so the view materializes blocks and lines again when it reaches any of them.
+        s, uids, unload = self.store, [], set()
+        for i in indices:
+            b = self.blocks.get(s.uid(i))
+            if b is None or b.store_index != i or b.is_manually_selected or b in self._touched: continue
+            spans = [s.edge_span(e) for e in s.edges_of(i) if self.edge_state[e]]
+            if any((x1 - x0 + 1) * (y1 - y0 + 1) > mapformat.LONG_EDGE_CHUNKS for x0, y0, x1, y1 in spans): continue
+            for e in s.edges_of(i): self.edge_state[e] = 0
+            for x0, y0, x1, y1 in spans: unload.update((cx, cy) for cy in range(y0, y1 + 1) for cx in range(x0, x1 + 1))
+            unload.add(s.chunk_key(s.xs[i], s.ys[i])); uids.append(b.uid)
+        for l in self.graph.remove_nodes(uids): l.refresh(); self.removeItem(l)
+        for uid in uids: b = self.blocks.pop(uid); self.pending[b.store_index] = 1; self.removeItem(b)
+        self.loaded_chunks -= unload
+
+    def materialize_neighbors(self, b):
+        if self.store is None or b.store_index is None: return
+        for e in self.store.edges_of(b.store_index): self.materialize_edge(e)
+
+    def grow_to(self, r):
+        bounds = self.sceneRect()
+        if not bounds.contains(r): self.setSceneRect(bounds.united(r.adjusted(-SCENE_MARGIN, -SCENE_MARGIN, SCENE_MARGIN, SCENE_MARGIN)))
+
+    def set_index(self, method, depth=0):
+        self.index_method, self.bsp_depth = method, depth
+        if not self._index_paused: self._apply_index(method)
+
+    def _apply_index(self, method):
+        # A new index starts at the default depth, so the tuned one goes in after the switch
+        self.setItemIndexMethod(method)
+        if method == QGraphicsScene.ItemIndexMethod.BspTreeIndex: self.setBspTreeDepth(self.bsp_depth)
+
+    # Bulk moves reindex every item they touch; with the index suspended they skip that and it is rebuilt once. Calls nest
+    def suspend_index(self):
+        self._index_paused += 1
+        if self._index_paused == 1: self._apply_index(QGraphicsScene.ItemIndexMethod.NoIndex)
+
+    def resume_index(self):
+        self._index_paused -= 1
+        if not self._index_paused: self._apply_index(self.index_method)
+
+    def content_rect(self):
+        r = self.itemsBoundingRect()
+        if self.store is not None and len(self.store):
+            x0, y0, x1, y1 = self.store.bounds(); r = r.united(QRectF(x0, y0, x1 - x0, y1 - y0))
+        return r
+
+    def to_dict(self):
+        data = {"bg": self.backgroundBrush().color().name(), "blocks": [b.to_record() for b in self.blocks.values()], "lines": [l.to_record() for _, _, l in self.graph.edges()]}
+        if self.store is not None:
+            s = self.store
+            data["blocks"] += [s.record(i) for i in range(len(s)) if self.pending[i]]
+            data["lines"] += [s.line(e) for e in range(s.edge_count()) if not self.edge_state[e]]
+        return data
+
+    def start_layout(self, mode, selection_only=False):
+        self.stop_layout()
+        if selection_only: blocks = list(self.selected_blocks)
+        else: self.materialize_all(); blocks = list(self.blocks.values())
+        if len(blocks) < 2: return
+        index = {b.uid: i for i, b in enumerate(blocks)}
+        edges = [(index[a], index[c]) for a, c, l in self.graph.edges() if a in index and c in index and (mode == "force" or l.is_directed)]
+        centers, sizes = [(b.x() + b.w / 2, b.y() + b.h / 2) for b in blocks], [(b.w, b.h) for b in blocks]
+        fn = maplayout.force_layout if mode == "force" else maplayout.layered_layout
+        self.layout_blocks, self.layout_run = blocks, maplayout.LayoutRun(fn, centers, sizes, edges); self.layout_timer.start()
+        # Every block and line moves on every tick, so the index is suspended until the layout settles and rebuilt once
+        self.suspend_index()
+
+    def stop_layout(self, keep=True):
+        # A layout stopped early keeps the positions on screen: they are snapped, logged and committed like a settled one
+        if self.layout_run is None: return
+        blocks = [b for b in self.layout_blocks if self.blocks.get(b.uid) is b]
+        self.layout_run.cancel(); self.layout_timer.stop(); self.layout_run = self.layout_blocks = None; self.resume_index()
+        if not keep or not blocks: return
+        self.place_blocks(blocks, [(b.x() + b.w / 2, b.y() + b.h / 2) for b in blocks], snap=self.parent.snap_to_grid)
+        for b in blocks: self.touch(b)
+        self.commit_changes(); self.grow_to(self.content_rect())
+
+    def step_layout(self):
+        run, blocks, t = self.layout_run, self.layout_blocks, time.perf_counter()
+        if run.error is not None: self.parent.statusBar().showMessage(f"Layout failed: {run.error}", 5000); self.stop_layout(); return
+        centers, settled = run.step()
+        self.place_blocks(blocks, centers.tolist())
+        # Ticks take at most a third of the time on big maps, so the worker thread keeps most of the GIL
+        self.layout_timer.setInterval(max(LAYOUT_TICK_MS, int((time.perf_counter() - t) * 2000)))
+        if settled: self.stop_layout()
+
+    def place_blocks(self, blocks, centers, snap=False):
+        # Moves many blocks at once; lines are re-laid without per-line repaints and the scene is repainted once
+        self.moving_group = True; lines = set()
+        try:
+            for b, (x, y) in zip(blocks, centers):
+                if self.blocks.get(b.uid) is not b: continue
+                x, y = x - b.w / 2, y - b.h / 2
+                if snap: x, y = round(x / GRID_SIZE) * GRID_SIZE, round(y / GRID_SIZE) * GRID_SIZE
+                b.setPos(x, y); lines.update(b.connections)
+        finally: self.moving_group = False
+        for l in lines: l.update_position(False)
+        self.update()
+
+    def set_detail(self, scale):
+        # Text items are faded and then hidden as the view zooms out, so overview paints skip them entirely
+        op = round(min(1.0, max(0.0, (scale - LOD_TEXT_HIDE) / (LOD_TEXT_FULL - LOD_TEXT_HIDE))), 1)
+        if op == self.text_opacity: return
+        self.text_opacity = op
+        for b in self.blocks.values(): b.text_item.setOpacity(op); b.text_item.setVisible(op > 0)
+
+    def mark_lines_dirty(self, lines):
+        # Line geometry is recomputed at most once per event-loop tick, however many moves touched it
+        self._dirty_lines.update(lines)
+        if self._dirty_lines and not self._flush_queued:
+            self._flush_queued = True; QTimer.singleShot(0, self.flush_lines)
+
+    def flush_lines(self):
+        self._flush_queued = False
+        dirty, self._dirty_lines = self._dirty_lines, set()
+        for l in dirty:
+            if l.scene(): l.update_position()
+
+    def queue_relayout(self, b):
+        # Resize drags relayout block text at most once per frame
+        self._relayout.add(b)
+        if not self._relayout_timer.isActive(): self._relayout_timer.start()
+
+    def flush_relayout(self):
+        self._relayout_timer.stop()
+        pending, self._relayout = self._relayout, set()
+        for b in pending:
+            if b.scene(): b.update_content(b.text_item.toPlainText())
+
+    def set_manual_selection(self, blocks, on=True):
+        for b in ([blocks] if isinstance(blocks, MindBlock) else blocks):
+            if on: self.selected_blocks.add(b)
+            else: self.selected_blocks.discard(b)
+            b.is_manually_selected = on; b.update()
+
+    def clear_manual_selection(self): self.set_manual_selection(list(self.selected_blocks), False)
+
+    def move_selection(self, offset, mover):
+        # Followers are translated in one batch; their itemChange returns straight away while moving_group is set, so
+        # they are marked for the journal here
+        if not self._drag_unindexed and len(self.selected_blocks) >= DRAG_UNINDEX * len(self.blocks):
+            self._drag_unindexed = True; self.suspend_index()
+        self.moving_group = True
+        try:
+            for b in self.selected_blocks:
+                if b is mover: continue
+                new_pos = b.pos() + offset
+                if self.parent.snap_to_grid:
+                    new_pos = QPointF(round(new_pos.x()/GRID_SIZE)*GRID_SIZE, round(new_pos.y()/GRID_SIZE)*GRID_SIZE)
+                b.setPos(new_pos); self.mark_lines_dirty(b.connections); self.grow_to(b.sceneBoundingRect()); self.touch(b)
+        finally: self.moving_group = False
+
+    def end_drag(self):
+        if self._drag_unindexed: self._drag_unindexed = False; self.resume_index()
+
+    def grid_tile(self, step):
+        # One tile holds GRID_TILE x GRID_TILE dot positions, drawn with a single drawPoints call; they do not depend on
+        # the background, so a theme change keeps them
+        tile = self._grid_tiles.get(step)
+        if tile is None:
+            tile = QPolygonF([QPointF(x * step, y * step) for y in range(GRID_TILE) for x in range(GRID_TILE)])
+            self._grid_tiles[step] = tile
+        return tile
+
+    def draw_grid(self, p, r):
+        p.fillRect(r, self.backgroundBrush())
+        scale, step = p.worldTransform().m11(), GRID_SIZE
+        while step * scale < GRID_MIN_SPACING:
+            step *= 2
+            if step > GRID_SIZE * GRID_MAX_SKIP: return
+        tile, span = self.grid_tile(step), step * GRID_TILE
+        p.save(); p.setPen(self.grid_pen)
+        x0, y0 = math.floor(r.left() / span) * span, math.floor(r.top() / span) * span
+        for y in range(int(y0), int(r.bottom()) + 1, span):
+            for x in range(int(x0), int(r.right()) + 1, span):
+                p.translate(x, y); p.drawPoints(tile); p.translate(-x, -y)
+        p.restore()
 
     def drawBackground(self, p, r):
-        p.fillRect(r, self.backgroundBrush()); p.setPen(QPen(QColor("#555555"), 1))
-        for x in range(int(r.left())-int(r.left()%30), int(r.right()), 30):
-            for y in range(int(r.top())-int(r.top()%30), int(r.bottom()), 30): p.drawPoint(x, y)
+        self.draw_grid(p, r); self.edges.paint(p, r)
+
+    def drawForeground(self, p, r):
+        # Thumbnails asked for stay pinned in PREVIEWS while their block is on screen; a partial repaint only settles
+        # the ones inside its rect, so a blinking cursor cannot unpin the rest and have them evicted and loaded again
+        if not self.shown_thumbs and not self.painted_thumbs: return
+        views = self.views(); on = views[0].mapToScene(views[0].viewport().rect()).boundingRect() if views else r
+        shown = {u: v for u, v in self.shown_thumbs.items() if v[1].intersects(on) and not v[1].intersects(r)}
+        shown.update(self.painted_thumbs); self.painted_thumbs = {}; self.shown_thumbs = shown
+        pinned = {f for f, _ in shown.values()}
+        if pinned != self.pinned: self.pinned = pinned; PREVIEWS.end_frame(self, pinned)
+
+    def watch_previews(self):
+        if not self.preview_timer.isActive(): PREVIEWS.watch(self); self.preview_timer.start()
+
+    def poll_previews(self):
+        # Thumbnails and file checks only come in for blocks that were on screen, so one repaint of the views shows them.
+        # Idle is read first: whatever landed before the pool went quiet is already in this scene's set
+        idle = not PREVIEWS.pending()
+        if PREVIEWS.take_landed(self): self.update()
+        if idle: PREVIEWS.unwatch(self); self.preview_timer.stop()
 
     def mousePressEvent(self, e):
-        it = self.itemAt(e.scenePos(), QGraphicsView().transform())
+        it = self.itemAt(e.scenePos(), IDENTITY)
         
         if e.button() == Qt.MouseButton.RightButton and (e.modifiers() & Qt.KeyboardModifier.ShiftModifier):
-            filters = "All Supported (*.pdf *.txt *.docx *.xlsx *.pptx *.map *.mp3 *.wav *.mp4 *.py *.html *.css *.js *.json *.zip *.rar);;All Files (*.*)"
-            p, _ = QFileDialog.getOpenFileName(None, "Import File", "", filters)
-            if p: self.addItem(MindBlock(e.scenePos().x(), e.scenePos().y(), self, file_path=p))
+            filters = "All Supported (*.pdf *.txt *.docx *.xlsx *.pptx *.map *.mapb *.mp3 *.wav *.mp4 *.py *.html *.css *.js *.json *.zip *.rar);;All Files (*.*)"
+            ps, _ = QFileDialog.getOpenFileNames(None, "Import Files", "", filters)
+            if ps: self.parent.import_paths(ps, e.scenePos())
             return
 
         if e.button() == Qt.MouseButton.LeftButton and it is None:
             if not (QApplication.keyboardModifiers() & Qt.KeyboardModifier.ShiftModifier):
-                for i in self.items(): (setattr(i, 'is_manually_selected', False), i.update()) if isinstance(i, MindBlock) else None
-                self.src = None
+                self.clear_manual_selection(); self.src = None
         
         if e.button() == Qt.MouseButton.RightButton and not (e.modifiers() & Qt.KeyboardModifier.ShiftModifier):
             if isinstance(it, ConnectionLine):
                 b1, b2, dr, col, sty = it.block1, it.block2, it.is_directed, it.line_color.name(), it.line_style
-                it.remove_self(); nb = MindBlock(e.scenePos().x()-95, e.scenePos().y()-20, self); self.addItem(nb)
-                for p_ in [(b1, nb), (nb, b2)]:
-                    nl = ConnectionLine(p_[0], p_[1], col, sty, dr); self.addItem(nl); p_[0].connections.append(nl); p_[1].connections.append(nl)
+                it.remove_self(); nb = self.add_block(MindBlock(e.scenePos().x()-95, e.scenePos().y()-20, self))
+                for p_ in [(b1, nb), (nb, b2)]: self.add_connection(p_[0], p_[1], col, sty, dr)
                 return
             elif it is None:
                 x, y = (round(e.scenePos().x()/30)*30, round(e.scenePos().y()/30)*30) if self.parent.snap_to_grid else (e.scenePos().x(), e.scenePos().y())
-                self.addItem(MindBlock(x, y, self)); return
+                self.add_block(MindBlock(x, y, self)); return
         if e.button() == Qt.MouseButton.LeftButton and isinstance(it, ConnectionLine): self.open_line_editor(it); return
         super().mousePressEvent(e)
 
-    def delete_block(self, b):
-        # AUTO-HEAL
-        incoming_nodes = []
-        outgoing_nodes = []
-        for conn in b.connections:
-            if conn.block2 == b: incoming_nodes.append(conn.block1)
-            elif conn.block1 == b: outgoing_nodes.append(conn.block2)
-
-        for l in list(b.connections): l.remove_self()
-        if b.scene(): self.removeItem(b)
-
-        for input_block in incoming_nodes:
-            for output_block in outgoing_nodes:
-                exists = False
-                for existing_conn in input_block.connections:
-                    if existing_conn.block1 == input_block and existing_conn.block2 == output_block:
-                        exists = True; break
-                
-                if not exists and input_block != output_block:
-                    nl = ConnectionLine(input_block, output_block, is_directed=True)
-                    self.addItem(nl)
-                    input_block.connections.append(nl); output_block.connections.append(nl)
+    def delete_block(self, b): self.delete_blocks([b])
+
+    def delete_blocks(self, blocks, heal=True):
+        # AUTO-HEAL: every path that ran through a deleted block is bridged with a directed connection
+        blocks = [b for b in blocks if self.blocks.get(b.uid) is b]
+        for b in blocks: self.materialize_neighbors(b)
+        uids = [b.uid for b in blocks]
+        pairs = self.graph.heal_pairs(uids) if heal else []
+        for l in self.graph.remove_nodes(uids): self.detach_line(l)
+        for b in blocks:
+            self.selected_blocks.discard(b); self._touched.discard(b); del self.blocks[b.uid]
+            if self.text_index is not None: self.text_index.remove(b.uid)
+            if self.src is b: self.src = None
+            if b.scene(): self.removeItem(b)
+            self.log("del", id=b.uid)
+        for a, c in pairs: self.add_connection(self.blocks[a], self.blocks[c], directed=True)
+
+    def remove_lines(self, lines):
+        for l in lines:
+            if self.graph.edge(l.block1.uid, l.block2.uid) is l: self.graph.remove_edge(l.block1.uid, l.block2.uid)
+            self.detach_line(l)
+
+    def detach_line(self, l):
+        self.log("unlink", b1=l.block1.uid, b2=l.block2.uid)
+        l.refresh(); self.removeItem(l)
 
     def open_line_editor(self, line):
         d = QDialog(); d.setWindowTitle("Connection Settings"); d.setFixedSize(350, 320); layout = QVBoxLayout(d)
@@ -368,62 +937,285 @@ class MindMapScene(QGraphicsScene):
         btn_del.clicked.connect(lambda: [line.remove_self(), d.accept()]); layout.addWidget(btn_del)
         btn_ok = QPushButton("✅ OK"); btn_ok.setMinimumHeight(40); btn_ok.clicked.connect(d.accept); layout.addWidget(btn_ok)
         if d.exec(): line.line_style = styles[cb.currentIndex()]; line.update_appearance()
+        if line.scene(): self.log("link", **line.to_record())
+
+    def add_connection(self, b1, b2, color="#aaaaaa", style=Qt.PenStyle.SolidLine, directed=False, record=True):
+        nl = self.graph.edge(b1.uid, b2.uid)
+        if nl is not None: return nl
+        nl = ConnectionLine(b1, b2, color, style, directed); self.addItem(nl); nl.refresh()
+        self.graph.add_edge(b1.uid, b2.uid, nl)
+        if record: self.log("link", **nl.to_record())
+        return nl
 
     def start_connection(self, b, directed=False):
-        if not self.src: self.src = b; b.is_manually_selected = True; b.update()
+        if not self.src: self.src = b; self.set_manual_selection(b, True)
         elif self.src != b:
-            if not any((l.block1 == self.src and l.block2 == b) for l in self.src.connections):
-                nl = ConnectionLine(self.src, b, is_directed=directed); self.addItem(nl); self.src.connections.append(nl); b.connections.append(nl)
-            self.src = None; [i.update() for i in self.items()]
+            if not self.graph.has_edge(self.src.uid, b.uid): self.add_connection(self.src, b, directed=directed)
+            self.src.update(); b.update(); self.src = None
         else: self.src = None
 
+def _png_chunk(f, kind, data):
+    f.write(struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data)))
+
+def _adler32_combine(a1, a2, len2):
+    # zlib's adler32_combine, so bands deflated on different threads still get one checksum
+    base = 65521; rem = len2 % base
+    s1 = (a1 & 0xffff) + (a2 & 0xffff) + base - 1
+    s2 = (rem * (a1 & 0xffff)) % base + ((a1 >> 16) & 0xffff) + ((a2 >> 16) & 0xffff) + base - rem
+    return (s1 % base) | ((s2 % base) << 16)
+
+def _deflate_band(raw, bpl, row_len, rows):
+    data = b"".join(b"\x00" + raw[r * bpl:r * bpl + row_len] for r in range(rows))
+    c = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return c.compress(data) + c.flush(zlib.Z_SYNC_FLUSH), zlib.adler32(data), len(data)
+
+def export_tiled(scene, path, scale=1.0, dpi=None, tile=EXPORT_TILE, workers=EXPORT_WORKERS, progress=None):
+    # Streams a PNG band by band, so memory stays at a few bands whatever the map size: store blocks materialized for
+    # a band are released once the bands have moved past them. Rendering stays on the calling thread (QGraphicsScene
+    # is not thread-safe); only deflate runs on workers. The PNG is written next to path and only replaces it once
+    # complete, so a cancelled or failed export leaves any existing file alone. Returns (width, height), or None if cancelled.
+    scene.flush_lines(); src = scene.content_rect().adjusted(-50, -50, 50, 50)
+    width, height = max(1, math.ceil(src.width() * scale)), max(1, math.ceil(src.height() * scale))
+    bands = range(0, height, tile); scene.set_detail(scale); tmp, done = path + ".tmp", False
+    if scene.store is not None: scene.newly_materialized = []
+    try:
+        done = _write_bands(scene, tmp, src, scale, dpi, tile, workers, progress, width, height, bands)
+        if done: os.replace(tmp, path)
+    finally:
+        if not done and os.path.exists(tmp): os.remove(tmp)
+        if scene.newly_materialized is not None: scene.release_blocks(scene.newly_materialized); scene.newly_materialized = None
+    return (width, height) if done else None
+
+def _write_bands(scene, tmp, src, scale, dpi, tile, workers, progress, width, height, bands):
+    with open(tmp, "wb") as f, ThreadPoolExecutor(max(1, workers)) as pool:
+        f.write(b"\x89PNG\r\n\x1a\n"); _png_chunk(f, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        if dpi: ppm = round(dpi / 0.0254); _png_chunk(f, b"pHYs", struct.pack(">IIB", ppm, ppm, 1))
+        _png_chunk(f, b"IDAT", b"\x78\x9c"); adler, in_flight, reach = 1, deque(), {}
+        def write_band(job):
+            nonlocal adler
+            data, band_adler, length = job.result(); adler = _adler32_combine(adler, band_adler, length)
+            _png_chunk(f, b"IDAT", data)
+        for n, y in enumerate(bands):
+            rows = min(tile, height - y)
+            band_src = QRectF(src.left(), src.top() + y / scale, src.width(), rows / scale)
+            scene.materialize_rect(band_src); scene.flush_lines()
+            img = QImage(width, rows, QImage.Format.Format_RGB888); img.fill(scene.backgroundBrush().color())
+            p = QPainter(img); p.setRenderHint(QPainter.RenderHint.Antialiasing)
+            for x in range(0, width, tile):
+                cols = min(tile, width - x)
+                scene.render(p, QRectF(x, 0, cols, rows), QRectF(src.left() + x / scale, band_src.top(), cols / scale, rows / scale), Qt.AspectRatioMode.IgnoreAspectRatio)
+            p.end()
+            bits = img.constBits(); bits.setsize(img.sizeInBytes())
+            in_flight.append(pool.submit(_deflate_band, bytes(bits), img.bytesPerLine(), width * 3, rows))
+            while len(in_flight) > max(1, workers): write_band(in_flight.popleft())
+            made = scene.newly_materialized
+            if made:
+                # Released only once no later band can load the block's chunk or a chunk one of its lines crosses,
+                # so a block is never materialized twice
+                s, top = scene.store, band_src.bottom(); row = math.floor((top - MATERIALIZE_MARGIN) / s.chunk_size)
+                for i in made:
+                    if i not in reach: reach[i] = max([s.chunk_key(s.xs[i], s.ys[i])[1]] + [s.edge_span(e)[3] for e in s.edges_of(i)])
+                passed = [i for i in made if reach[i] < row and s.ys[i] + s.hs[i] < top]
+                if passed: scene.release_blocks(passed); scene.newly_materialized = [i for i in made if scene.pending[i] == 0]
+            if progress and progress(n + 1, len(bands)) is False: return False
+        while in_flight: write_band(in_flight.popleft())
+        _png_chunk(f, b"IDAT", b"\x03\x00" + struct.pack(">I", adler))
+        _png_chunk(f, b"IEND", b"")
+    return True
+
+def set_profiling(on):
+    global PROFILER
+    if on == (PROFILER is not None): return
+    if on:
+        PROFILER = mapprofile.Profiler()
+        # Connections have no paint of their own; EdgeLayer.paint draws them all from drawBackground
+        PROFILER.install([(MindMapScene, ("drawBackground", "draw_grid", "flush_lines", "materialize_rect", "step_layout")), (EdgeLayer, ("paint",)),
+                          (MindBlock, ("paint", "itemChange", "update_content")), (ConnectionLine, ("update_position",))])
+    else: PROFILER.uninstall(); PROFILER = None
+    for w in QApplication.allWidgets():
+        if isinstance(w, CustomView): w.show_hud(on)
+
+def workspace_index():
+    global WORKSPACE
+    if WORKSPACE is None: WORKSPACE = mapworkspace.WorkspaceIndex()
+    return WORKSPACE
+
+class SearchPanel(QDockWidget):
+    # Results follow the query as it is typed; picking one centres the view on it and highlights every listed match
+    # in its map. With "All linked maps" the query runs on the workspace index and other maps are opened in place.
+    def __init__(self, win):
+        super().__init__("Search", win); self.win = win; self.hits = []
+        body = QWidget(); layout = QVBoxLayout(body); layout.setContentsMargins(6, 6, 6, 6)
+        self.field = QLineEdit(); self.field.setPlaceholderText("Search blocks and files...")
+        self.scope = QCheckBox("All linked maps"); self.results = QListWidget(); self.status = QLabel()
+        for w in (self.field, self.scope, self.results, self.status): layout.addWidget(w)
+        self.setWidget(body)
+        self.field.textChanged.connect(self.run); self.field.returnPressed.connect(lambda: self.pick(0))
+        self.scope.toggled.connect(lambda on: [self.win.index_workspace() if on else None, self.run()])
+        self.results.currentRowChanged.connect(self.pick); self.results.itemActivated.connect(lambda it: self.pick(self.results.row(it)))
+
+    def open(self): self.show(); self.raise_(); self.field.setFocus(); self.field.selectAll()
+
+    def run(self):
+        # hits are (map path or None for this map, block uid, label)
+        t = time.perf_counter(); sc, ws = self.win.scene, self.win.workspace; query = self.field.text()
+        if not query.strip(): self.hits = []
+        elif not self.scope.isChecked(): self.hits = [(None, uid, sc.text_index.docs[uid]) for uid in sc.search(query)]
+        elif ws is not None: self.hits = [(p, uid, ws.text.docs[(p, uid)]) for p, uid in ws.text.search(query, SEARCH_LIMIT)]
+        else: self.hits = []
+        ms = (time.perf_counter() - t) * 1000
+        self.results.blockSignals(True); self.results.clear()
+        for p, _, (text, name, *_) in self.hits:
+            label = " ".join(text.split())[:80] or name
+            self.results.addItem(f"{os.path.basename(p)} › {label}" if p else label)
+        self.results.blockSignals(False)
+        more = "+" if len(self.hits) == SEARCH_LIMIT else ""
+        if not query.strip(): self.status.setText("")
+        elif self.scope.isChecked() and ws is None: self.status.setText("Indexing linked maps...")
+        else: self.status.setText(f"{len(self.hits)}{more} matches in {ms:.1f} ms")
+
+    def pick(self, row):
+        if not 0 <= row < len(self.hits): return
+        path, uid, _ = self.hits[row]
+        self.win.jump_to(path, uid, [u for p, u, _ in self.hits if p == path])
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, path=None):
         super().__init__(); self.setWindowTitle("Pro Mind Map v95 - Final Safe")
-        self.snap_to_grid = True; self.is_global_resize_mode = False; self.current_file = None
+        self.snap_to_grid = True; self.is_global_resize_mode = False; self.current_file = None; self.journal = None; self.journal_failed = False
+        self.trail = []; self.sub_windows = []
+        self.workspace = self.ws_scan = None; self.broken_pending = False
+        self.imports = []; self.jobs = {}; self.job_timer = QTimer(self, timeout=self.poll_jobs)
         self.scene = MindMapScene(self); self.scene.setBackgroundBrush(QBrush(QColor("#2b2b2b")))
         self.view = CustomView(self.scene); self.setCentralWidget(self.view)
-        self.init_menu()
-        if len(sys.argv) > 1 and os.path.exists(sys.argv[1]): self.load_from_path(sys.argv[1])
+        self.search_panel = SearchPanel(self); self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.search_panel); self.search_panel.hide()
+        if os.environ.get(PROFILE_ENV): set_profiling(True)
+        self.init_menu(); self.view.show_hud(PROFILER is not None)
+        self.autosave_timer = QTimer(self, interval=AUTOSAVE_MS, timeout=self.autosave); self.autosave_timer.start()
+        if path is None and len(sys.argv) > 1: path = sys.argv[1]
+        if path and os.path.exists(path): self.load_from_path(path); self.index_workspace()
 
     def init_menu(self):
         mb = self.menuBar(); fm = mb.addMenu("File")
         fm.addAction(QAction("New Map", self, shortcut="Ctrl+N", triggered=self.new_map))
         fm.addAction(QAction("Open File", self, shortcut="Ctrl+O", triggered=self.load))
         fm.addAction(QAction("Import...", self, shortcut="Ctrl+I", triggered=self.import_from_menu))
+        fm.addAction(QAction("Import Folder...", self, shortcut="Ctrl+Shift+I", triggered=self.import_folder))
         fm.addAction(QAction("Save", self, shortcut="Ctrl+S", triggered=self.save))
         fm.addAction(QAction("Save As", self, shortcut="Ctrl+Shift+S", triggered=self.save_as))
         fm.addAction(QAction("Export PNG", self, triggered=self.export_png))
+        fm.addAction(QAction("Find...", self, shortcut="Ctrl+F", triggered=lambda: self.search_panel.open()))
+        wm = mb.addMenu("Workspace")
+        wm.addAction(QAction("Reindex Linked Maps", self, triggered=self.index_workspace))
+        wm.addAction(QAction("Broken Links...", self, triggered=self.broken_links))
+        lm = mb.addMenu("Layout")
+        lm.addAction(QAction("Force-Directed", self, shortcut="Ctrl+L", triggered=lambda: self.auto_layout("force")))
+        lm.addAction(QAction("Layered", self, shortcut="Ctrl+Shift+L", triggered=lambda: self.auto_layout("layered")))
+        self.sel_layout_act = QAction("Selection Only", self, checkable=True); lm.addAction(self.sel_layout_act)
+        lm.addAction(QAction("Stop", self, shortcut="Esc", triggered=lambda: self.scene.stop_layout()))
         am = mb.addMenu("Settings")
         self.snap_act = QAction("Snap [S]", self, checkable=True, shortcut="S"); self.snap_act.setChecked(True)
         self.snap_act.triggered.connect(lambda: setattr(self, 'snap_to_grid', self.snap_act.isChecked())); am.addAction(self.snap_act)
         self.res_act = QAction("Resize [R]", self, checkable=True, shortcut="R"); self.res_act.triggered.connect(self.toggle_resize); am.addAction(self.res_act)
         tm = am.addMenu("Theme"); tm.addAction("Dark", lambda: self.set_bg("#2b2b2b")); tm.addAction("Light", lambda: self.set_bg("#f0f0f0")); tm.addAction("Custom...", self.pick_bg)
+        self.win_act = QAction("Sub-maps in New Window", self, checkable=True); am.addAction(self.win_act)
+        self.prof_act = QAction("Performance HUD", self, checkable=True, shortcut="F12"); self.prof_act.setChecked(PROFILER is not None)
+        self.prof_act.triggered.connect(lambda on: set_profiling(on)); am.addAction(self.prof_act)
+        am.addAction(QAction("Save Performance Trace...", self, triggered=self.save_trace))
+        self.addAction(QAction("Back", self, shortcut="Alt+Left", triggered=lambda: self.go_back(len(self.trail) - 1)))
+        self.crumbs = self.addToolBar("Maps"); self.crumbs.setMovable(False); self.crumbs.hide()
 
     def new_map(self):
         reply = QMessageBox.question(self, 'New Map', "Are you sure you want to create a new map? Unsaved changes will be lost.", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
-            self.scene.clear(); self.current_file = None; self.set_bg("#2b2b2b")
+            self.cancel_imports(); self.open_journal(None); self.scene.clear(); self.current_file = None; self.set_bg("#2b2b2b"); self.set_trail([]); self.search_panel.run()
 
     def import_from_menu(self):
-        filters = "All Supported (*.pdf *.txt *.docx *.xlsx *.pptx *.map *.mp3 *.wav *.mp4 *.py *.html *.css *.js *.json *.zip *.rar);;All Files (*.*)"
-        p, _ = QFileDialog.getOpenFileName(self, "Import File", "", filters)
-        if p:
-            center_pos = self.view.mapToScene(self.view.viewport().rect().center())
-            self.scene.addItem(MindBlock(center_pos.x(), center_pos.y(), self.scene, file_path=p))
+        filters = "All Supported (*.pdf *.txt *.docx *.xlsx *.pptx *.map *.mapb *.mp3 *.wav *.mp4 *.py *.html *.css *.js *.json *.zip *.rar *.png *.jpg *.jpeg *.gif *.webp);;All Files (*.*)"
+        ps, _ = QFileDialog.getOpenFileNames(self, "Import Files", "", filters)
+        if ps: self.import_paths(ps)
+
+    def import_folder(self):
+        d = QFileDialog.getExistingDirectory(self, "Import Folder")
+        if d: self.import_paths([d])
+
+    # Bulk import: folders are walked on a thread pool and the files come in a batch per tick, so the window keeps painting
+    def import_paths(self, paths, pos=None):
+        if pos is None: pos = self.view.mapToScene(self.view.viewport().rect().center())
+        x, y = (round(pos.x() / GRID_SIZE) * GRID_SIZE, round(pos.y() / GRID_SIZE) * GRID_SIZE) if self.snap_to_grid else (pos.x(), pos.y())
+        # [walk, files of the folder being placed, row start x, next x, row top y, row height, blocks added]
+        run = [mapimport.BulkImport(paths), deque(), x, x, y, 0, 0]; self.imports.append(run)
+        self.watch_job(run[0], lambda walk: self.step_import(run), 0)
+
+    def step_import(self, run):
+        t, scene = time.perf_counter(), self.scene
+        walk, files, x0, x, y, row_h, added = run
+        while time.perf_counter() - t < IMPORT_TICK_MS / 1000:
+            if not files:
+                if not walk.ready: break
+                files.extend(walk.ready.popleft())
+                if x != x0: x, y, row_h = x0, y + row_h + GRID_SIZE, 0
+            p = files.popleft(); preview = mapimport.has_thumb(p)
+            b = MindBlock(x, y, scene, height=PREVIEW_H if preview else 40, v_align=2 if preview else 1, file_path=p)
+            if x != x0 and x + b.w > x0 + IMPORT_ROW_W: x, y, row_h = x0, y + row_h + GRID_SIZE, 0; b.setPos(x, y)
+            scene.add_block(b); x += math.ceil((b.w + GRID_SIZE) / GRID_SIZE) * GRID_SIZE; row_h = max(row_h, b.h); added += 1
+        run[3:] = x, y, row_h, added; scene.commit_changes()
+        if not (walk.done and not walk.ready and not files):
+            self.statusBar().showMessage("Importing... %d of %d files" % (sum(r[6] for r in self.imports), sum(r[0].found for r in self.imports))); return False
+        self.imports.remove(run)
+        if walk.error is not None: self.statusBar().showMessage(f"Import failed: {walk.error}", 5000)
+        elif not self.imports: self.statusBar().showMessage("Import finished", 3000)
+        if not self.imports: self.search_panel.run()
+        return True
+
+    # Background jobs the window waits on, each with the method that takes in its results and returns True once it is
+    # finished with the job. One timer polls them all, as often as the most eager of them asks.
+    def watch_job(self, job, step, interval):
+        self.jobs[job] = (step, interval); self.job_timer.start(min(i for _, i in self.jobs.values()))
+
+    def drop_job(self, job): job.cancel(); self.jobs.pop(job, None)
 
-    def set_bg(self, c): self.scene.setBackgroundBrush(QBrush(QColor(c)))
+    def cancel_imports(self):
+        # Imports place blocks into the map on screen, so they stop when that map is replaced
+        for walk, *_ in self.imports: self.drop_job(walk)
+        self.imports.clear()
+
+    def poll_jobs(self):
+        for job, (step, _) in list(self.jobs.items()):
+            if job in self.jobs and step(job): self.jobs.pop(job, None)
+        if self.jobs: self.job_timer.setInterval(min(i for _, i in self.jobs.values()))
+        else: self.job_timer.stop()
+
+    def set_bg(self, c): self.scene.setBackgroundBrush(QBrush(QColor(c))); self.scene.log("bg", c=QColor(c).name())
     def pick_bg(self):
         c = QColorDialog.getColor(self.scene.backgroundBrush().color(), self)
         if c.isValid(): self.set_bg(c.name())
+    def auto_layout(self, mode):
+        if maplayout is None: QMessageBox.warning(self, "Auto Layout", "NumPy is missing! Please run 'pip install numpy'."); return
+        self.scene.start_layout(mode, self.sel_layout_act.isChecked())
+    def show_block(self, b):
+        # The scene rect grows by a viewport around the block first, or centerOn would stop at the scene's edge
+        zoom, c, vp = max(self.view.transform().m11(), SEARCH_ZOOM), b.sceneBoundingRect().center(), self.view.viewport().rect()
+        self.scene.grow_to(QRectF(c.x() - vp.width() / zoom / 2, c.y() - vp.height() / zoom / 2, vp.width() / zoom, vp.height() / zoom))
+        self.view.resetTransform(); self.view.scale(zoom, zoom); self.scene.set_detail(zoom)
+        self.view.centerOn(c); self.view.sync_visible()
+    def jump_to(self, path, uid, highlight=()):
+        # path is a map from the workspace index, or None for the map on screen
+        if path is not None and (not self.current_file or mapworkspace.norm(self.current_file) != path) and not self.enter_map(path): return
+        b = self.scene.block_by_uid(uid)
+        if b is None: return
+        self.scene.clear_manual_selection(); self.scene.set_manual_selection([x for x in map(self.scene.block_by_uid, highlight or [uid]) if x is not None], True)
+        self.show_block(b)
     def delete_manually_selected(self):
-        for item in [i for i in self.scene.items() if isinstance(i, MindBlock) and i.is_manually_selected]: self.scene.delete_block(item)
+        self.scene.delete_blocks(list(self.scene.selected_blocks))
     def export_png(self):
-        r = self.scene.itemsBoundingRect().adjusted(-50,-50,50,50)
-        img = QImage(r.size().toSize(), QImage.Format.Format_ARGB32); img.fill(self.scene.backgroundBrush().color())
-        p = QPainter(img); p.setRenderHint(QPainter.RenderHint.Antialiasing); self.scene.render(p, QRectF(img.rect()), r); p.end()
         path, _ = QFileDialog.getSaveFileName(self, "Save", "", "PNG Files (*.png)")
-        if path: img.save(path)
+        if not path: return
+        dlg = QProgressDialog("Exporting PNG...", "Cancel", 0, 100, self); dlg.setWindowModality(Qt.WindowModality.WindowModal)
+        def progress(done, total): dlg.setMaximum(total); dlg.setValue(done); return not dlg.wasCanceled()
+        try: export_tiled(self.scene, path, progress=progress)
+        except OSError as e: QMessageBox.warning(self, "Export Failed", f"Could not write {path}:\n{e}")
+        finally: dlg.close(); self.scene.set_detail(self.view.transform().m11()); self.view.sync_visible()
     def toggle_resize(self):
         self.is_global_resize_mode = self.res_act.isChecked()
         self.view.setCursor(Qt.CursorShape.SizeFDiagCursor if self.is_global_resize_mode else Qt.CursorShape.ArrowCursor); self.scene.update()
@@ -432,35 +1224,142 @@ class MainWindow(QMainWindow):
         super().keyPressEvent(event)
     def save(self): self.do_save(self.current_file) if self.current_file else self.save_as()
     def save_as(self):
-        p, _ = QFileDialog.getSaveFileName(self, "Save As", "", "Map Files (*.map)")
+        p, _ = QFileDialog.getSaveFileName(self, "Save As", "", "Map Files (*.map);;Binary Map Files (*.mapb)")
         if p: self.current_file = p; self.do_save(p)
     def do_save(self, path):
-        data = {"bg": self.scene.backgroundBrush().color().name(), "blocks": [], "lines": []}
-        for b in [i for i in self.scene.items() if isinstance(i, MindBlock)]:
-            data["blocks"].append({
-                "x": b.x(), "y": b.y(), "txt": b.text_item.toPlainText(), "bc": b.brush_color.name(), "tc": b.text_color.name(), 
-                "ha": b.h_alignment, "va": b.v_alignment, "id": b.uid, "w": b.w, "h": b.h, "f_path": b.file_path
-            })
-        for l in [i for i in self.scene.items() if isinstance(i, ConnectionLine)]:
-            data["lines"].append({"b1": l.block1.uid, "b2": l.block2.uid, "c": l.line_color.name(), "s": int(l.line_style.value), "dir": l.is_directed})
-        with open(path, "w") as f: json.dump(data, f)
+        # The snapshot is written by the journal thread; only building the dict happens here. Without a journal (its
+        # folder cannot be written) the map is saved right away, so the error shows now.
+        self.scene.commit_changes()
+        if self.journal is None or self.journal.map_path != path: self.open_journal(path)
+        if self.journal is not None: self.report_journal(self.journal); self.journal.snapshot(self.scene.to_dict()); return
+        try: mapformat.save(path, self.scene.to_dict())
+        except OSError as e: QMessageBox.warning(self, "Save Failed", f"Could not save {path}:\n{e}")
+    def open_journal(self, path):
+        if self.journal is not None: self.scene.commit_changes(); self.journal.close(); self.report_journal(self.journal)
+        self.journal = self.scene.journal = None; self.journal_failed = False
+        if not path: return
+        try: self.journal = self.scene.journal = mapformat.MapJournal(path)
+        except OSError as e: self.statusBar().showMessage(f"Changes to {os.path.basename(path)} are not autosaved: {e}", 10000)
+    def report_journal(self, journal):
+        # Called from the autosave timer too, so a failure is shown once and stays quiet until a write works again
+        e, name = journal.take_error(), os.path.basename(journal.map_path)
+        if e is not None and not self.journal_failed: self.journal_failed = True; self.statusBar().showMessage(f"Could not save {name} or its journal: {e}")
+        elif e is None and self.journal_failed and not journal.failing: self.journal_failed = False; self.statusBar().showMessage(f"Saving {name} works again", 5000)
+    def autosave(self):
+        self.scene.commit_changes()
+        if self.journal is None: return
+        self.report_journal(self.journal)
+        if self.journal.pending >= COMPACT_OPS: self.do_save(self.journal.map_path)
+    def save_trace(self):
+        if PROFILER is None: QMessageBox.information(self, "Performance Trace", "Turn on the Performance HUD first, then use the map and save."); return
+        path, _ = QFileDialog.getSaveFileName(self, "Save Trace", "trace.json", "Chrome Trace (*.json)")
+        if path: n = PROFILER.write_trace(path); self.statusBar().showMessage(f"Saved {n} trace events to {path}", 5000)
+    def closeEvent(self, e):
+        trace = os.environ.get(PROFILE_ENV, "")
+        if PROFILER is not None and trace.lower().endswith(".json"): PROFILER.write_trace(trace)
+        for job in list(self.jobs): self.drop_job(job)
+        self.scene.preview_timer.stop(); PREVIEWS.unwatch(self.scene); PREVIEWS.end_frame(self.scene, set())
+        self.open_journal(None); super().closeEvent(e)
     def load(self):
-        p, _ = QFileDialog.getOpenFileName(self, "Open File", "", "Map Files (*.map)")
-        if p: self.load_from_path(p)
-
-    def load_from_path(self, path):
-        self.scene.clear(); self.current_file = path
-        with open(path, "r") as f: data = json.load(f)
-        self.set_bg(data.get("bg", "#2b2b2b"))
-        u = {}
-        for b in data["blocks"]:
-            nb = MindBlock(b["x"], b["y"], self.scene, b["txt"], b["bc"], b.get("tc", "#FFFFFF"), b.get("ha", 1), b.get("va", 1), b["id"], b.get("w", 190), b.get("h", 40), b.get("f_path", ""))
-            self.scene.addItem(nb); u[b["id"]] = nb
-        for l in data["lines"]:
-            b1, b2 = u.get(l["b1"]), u.get(l["b2"])
-            if b1 and b2:
-                nl = ConnectionLine(b1, b2, l["c"], Qt.PenStyle(l["s"]), l.get("dir", False))
-                self.scene.addItem(nl); b1.connections.append(nl); b2.connections.append(nl)
+        p, _ = QFileDialog.getOpenFileName(self, "Open File", "", "Map Files (*.map *.mapb)")
+        if p and self.try_load(p): self.set_trail([])
+
+    def load_from_path(self, path, journal=True):
+        # The journal is closed before the cache checks the file, so a pending snapshot has landed and changed its mtime
+        self.cancel_imports(); self.open_journal(None)
+        store = MAP_CACHE.load(path); self.current_file = path
+        self.scene.attach_store(store); self.set_bg(store.bg)
+        for op in mapformat.read_journal(path): self.scene.apply_op(op)
+        if journal: self.open_journal(path)
+        self.view.sync_visible(); self.search_panel.run()
+
+    # Sub-maps open in place; self.trail holds (path, unsaved map dict, zoom, view centre) for each map above this one
+    def open_sub_map(self, path, new_window=False):
+        if new_window or self.win_act.isChecked():
+            w = MainWindow(path); w.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose); w.resize(self.size()); w.show()
+            self.sub_windows.append(w); w.destroyed.connect(lambda _=None, w=w: self.sub_windows.remove(w)); return
+        self.enter_map(path)
+
+    def try_load(self, path):
+        # A map that cannot be read leaves the one on screen open with its journal, and the user is told why
+        try: self.load_from_path(path); return True
+        except Exception as e:
+            if self.current_file: self.open_journal(self.current_file)
+            QMessageBox.warning(self, "Open Failed", f"Could not open {path}:\n{e}"); return False
+
+    def enter_map(self, path):
+        entry = self.trail_entry()
+        if not self.try_load(path): return False
+        self.view.resetTransform(); self.scene.set_detail(1.0); self.view.centerOn(self.scene.content_rect().center())
+        self.set_trail(self.trail + [entry]); return True
+
+    def trail_entry(self):
+        self.scene.commit_changes()
+        data = None if self.current_file else self.scene.to_dict()
+        return self.current_file, data, self.view.transform().m11(), self.view.mapToScene(self.view.viewport().rect().center())
+
+    def go_back(self, depth):
+        if not 0 <= depth < len(self.trail): return
+        path, data, zoom, center = self.trail[depth]
+        if path:
+            if not self.try_load(path): return
+        else:
+            self.cancel_imports(); self.open_journal(None); self.current_file = None
+            self.scene.attach_store(mapformat.BlockStore.from_dict(data)); self.set_bg(data["bg"]); self.search_panel.run()
+        self.view.resetTransform(); self.view.scale(zoom, zoom); self.scene.set_detail(zoom); self.view.centerOn(center)
+        self.set_trail(self.trail[:depth])
+
+    def set_trail(self, trail):
+        self.trail = trail; self.crumbs.clear(); self.crumbs.setVisible(bool(trail))
+        for depth, (path, *_) in enumerate(trail):
+            self.crumbs.addAction(os.path.basename(path) if path else "Untitled", lambda d=depth: self.go_back(d)); self.crumbs.addSeparator()
+        if trail: self.crumbs.addAction(os.path.basename(self.current_file)).setEnabled(False)
+        self.index_workspace()
+
+    # Workspace: every map reachable through .map links from the top of the trail, crawled in the background
+    def index_workspace(self):
+        root = next((p for p, *_ in self.trail if p), None) or self.current_file
+        if self.ws_scan is not None: self.drop_job(self.ws_scan)
+        if not root: self.workspace = self.ws_scan = None; return
+        self.ws_scan = mapworkspace.WorkspaceScan(workspace_index(), root); self.watch_job(self.ws_scan, self.poll_workspace, WORKSPACE_POLL_MS)
+
+    def poll_workspace(self, scan):
+        if not scan.done: self.statusBar().showMessage("Indexing linked maps... %d/%d" % scan.progress); return False
+        if scan.error is not None: self.statusBar().showMessage(f"Indexing failed: {scan.error}", 5000); return True
+        self.workspace = scan; self.statusBar().showMessage(f"Indexed {len(scan.maps)} linked maps, {scan.parsed} re-read", 5000)
+        if self.search_panel.scope.isChecked(): self.search_panel.run()
+        if self.broken_pending: self.broken_pending = False; self.show_broken_links()
+        return True
+
+    def broken_links(self):
+        if not self.current_file: QMessageBox.information(self, "Broken Links", "Save the map first to check its links."); return
+        self.broken_pending = True; self.index_workspace()
+
+    def show_broken_links(self):
+        scan = self.workspace; d = QDialog(self); d.setWindowTitle("Broken Links"); d.resize(700, 400); layout = QVBoxLayout(d)
+        layout.addWidget(QLabel(f"<b>{len(scan.broken)} broken links in {len(scan.maps)} maps</b> (double click to jump)"))
+        lst = QListWidget(); layout.addWidget(lst)
+        for p, _, text, link, why in scan.broken: lst.addItem(f"{os.path.basename(p)} › {' '.join(text.split())[:40]} → {link} ({why})")
+        lst.itemActivated.connect(lambda it: [d.accept(), self.jump_to(*scan.broken[lst.row(it)][:2])])
+        btn_ok = QPushButton("✅ OK"); btn_ok.clicked.connect(d.accept); layout.addWidget(btn_ok)
+        d.exec()
+
+def run_export_cli(argv):
+    ap = argparse.ArgumentParser(prog="mindmap.py", description="Render a map to PNG without opening a window.")
+    ap.add_argument("--export", nargs=2, metavar=("IN_MAP", "OUT_PNG"), required=True)
+    ap.add_argument("--scale", type=float, default=None, help="scene units to pixels (default 1, or dpi/96)")
+    ap.add_argument("--dpi", type=float, default=None)
+    ap.add_argument("--tile", type=int, default=EXPORT_TILE)
+    ap.add_argument("--workers", type=int, default=EXPORT_WORKERS)
+    args = ap.parse_args(argv)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication(sys.argv[:1]); win = MainWindow(); win.load_from_path(args.export[0], journal=False)
+    scale = args.scale if args.scale else (args.dpi / 96 if args.dpi else 1.0)
+    w, h = export_tiled(win.scene, args.export[1], scale, args.dpi, args.tile, args.workers)
+    print(f"Exported {w}x{h} to {args.export[1]}")
+    return 0
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # the workspace scan's spawned workers re-run a frozen build's exe
+    if "--export" in sys.argv: sys.exit(run_export_cli(sys.argv[1:]))
     app = QApplication(sys.argv); win = MainWindow(); win.showMaximized(); sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt6.QtWidgets")
+
+import mapformat
+import mindmap
+from PyQt6.QtCore import QPointF
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def block(uid, x, y):
+    return {"x": x, "y": y, "txt": f"Block {uid}", "bc": "#4a90e2", "tc": "#ffffff", "ha": 1, "va": 1, "id": uid, "w": 190, "h": 40, "f_path": ""}
+
+def open_map(path, journal=True):
+    win = mindmap.MainWindow(); win.load_from_path(path, journal); win.scene.materialize_all()
+    return win
+
+def positions(win): return {uid: (b.x(), b.y()) for uid, b in win.scene.blocks.items()}
+
+
+def test_group_move_replays_after_a_crash(tmp_path):
+    path = str(tmp_path / "m.map")
+    mapformat.save(path, {"bg": "#2b2b2b", "blocks": [block("1", 0, 0), block("2", 300, 0), block("3", 600, 0)], "lines": []})
+    win = open_map(path); scene = win.scene
+    scene.set_manual_selection([scene.blocks["1"], scene.blocks["2"]])
+    scene.blocks["1"].setPos(scene.blocks["1"].pos() + QPointF(90, 60))
+    moved = positions(win); assert moved["2"] == (390, 60) and moved["3"] == (600, 0)
+    scene.commit_changes(); win.journal.flush()
+    # No snapshot: the map file is as it was and only the journal holds the move
+    assert positions(open_map(path, journal=False)) == moved
+    win.open_journal(None)
@@ -0,0 +1,64 @@
+import random
+
+from mapgraph import MapGraph
+
+
+def graph(edges):
+    g = MapGraph(); g.add_edges((a, b, (a, b)) for a, b in edges)
+    return g
+
+def splice(g, uids):
+    # What deleting blocks did before MapGraph: one block at a time, every a -> d -> b gains a -> b unless it exists or a == b
+    for d in uids:
+        sources, targets = g.predecessors(d), g.successors(d)
+        g.remove_nodes([d])
+        for a in sources:
+            for b in targets:
+                if a != d and b != d and a != b: g.add_edge(a, b, (a, b))
+    return g
+
+def heal(g, uids):
+    pairs = g.heal_pairs(uids); g.remove_nodes(uids); g.add_edges((a, b, (a, b)) for a, b in pairs)
+    return g, pairs
+
+def edge_set(g): return {(a, b) for a, b, _ in g.edges()}
+
+
+def test_add_edge_keeps_the_first():
+    g = MapGraph()
+    assert g.add_edge("a", "b", 1) == 1 and g.add_edge("a", "b", 2) == 1
+    assert len(g) == 1 and g.edge("a", "b") == 1 and g.predecessors("b") == ["a"]
+
+def test_remove_edge():
+    g = graph([("a", "b"), ("b", "c")])
+    assert g.remove_edge("a", "b") == ("a", "b") and g.remove_edge("a", "b") is None
+    assert edge_set(g) == {("b", "c")} and g.predecessors("b") == []
+
+def test_remove_nodes_returns_each_edge_once():
+    g = graph([("a", "b"), ("b", "a"), ("b", "b"), ("b", "c"), ("c", "d")])
+    assert sorted(g.remove_nodes(["b"])) == [("a", "b"), ("b", "a"), ("b", "b"), ("b", "c")]
+    assert edge_set(g) == {("c", "d")} and g.successors("a") == [] and g.predecessors("c") == []
+
+def test_edges_of_lists_a_self_loop_twice():
+    g = graph([("a", "a"), ("a", "b")])
+    assert sorted(g.edges_of("a")) == [("a", "a"), ("a", "a"), ("a", "b")]
+
+def test_heal_chain():
+    g, pairs = heal(graph([("a", "d1"), ("d1", "d2"), ("d2", "b")]), ["d1", "d2"])
+    assert pairs == [("a", "b")] and edge_set(g) == {("a", "b")}
+
+def test_heal_skips_existing_edges_and_self_loops():
+    g, pairs = heal(graph([("a", "d"), ("d", "a"), ("d", "b"), ("a", "b")]), ["d"])
+    assert pairs == [] and edge_set(g) == {("a", "b")}
+
+def test_heal_pairs_are_unique():
+    g = graph([("a", "d1"), ("a", "d2"), ("d1", "b"), ("d2", "b"), ("d1", "d2")])
+    assert g.heal_pairs(["d1", "d2"]) == [("a", "b")]
+
+def test_heal_matches_splicing_one_at_a_time():
+    rng = random.Random(11)
+    for _ in range(300):
+        nodes = list(range(rng.randint(2, 12)))
+        edges = {(rng.choice(nodes), rng.choice(nodes)) for _ in range(rng.randint(0, 30))}
+        gone = rng.sample(nodes, rng.randint(1, len(nodes)))
+        assert edge_set(heal(graph(edges), gone)[0]) == edge_set(splice(graph(edges), gone))
@@ -0,0 +1,100 @@
+import random
+
+from mapsearch import RESORT_AFTER, TextIndex, words
+
+
+def index(docs):
+    ix = TextIndex()
+    for uid, text in docs.items(): ix.set(uid, text)
+    return ix
+
+def brute(docs, q):
+    # Every query word must be a word, prefix of a word, or one edit (length >= 4) from a word of the block
+    def hit(t, ws): return any(w.startswith(t) or (len(t) >= 4 and near(t, w)) for w in ws)
+    def near(a, b):
+        if a == b: return True
+        if abs(len(a) - len(b)) > 1: return False
+        dels = lambda s: {s[:i] + s[i + 1:] for i in range(len(s))}
+        if len(a) != len(b): return (a in dels(b)) or (b in dels(a))
+        d = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(d) == 1 or (len(d) == 2 and d[1] == d[0] + 1 and a[d[0]] == b[d[1]] and a[d[1]] == b[d[0]])
+    return {u for u, text in docs.items() if all(hit(t, words(text)) for t in words(q))}
+
+
+def test_exact_before_prefix_before_fuzzy():
+    ix = index({1: "planet", 2: "plan", 3: "plans", 4: "plain"})
+    assert ix.search("plan") == [2, 1, 3, 4]
+
+def test_prefix_matches_word_starts_only():
+    ix = index({1: "Rocket launch", 2: "pocket", 3: "rock garden"})
+    assert ix.search("roc") == [3, 1] and ix.search("cket") == []
+
+def test_fuzzy_typo_missing_extra_and_swapped_letters():
+    ix = index({1: "receive", 2: "separate", 3: "address", 4: "believe"})
+    assert ix.search("recieve") == [1]
+    assert ix.search("seperate") == [2]
+    assert ix.search("adress") == [3]
+    assert ix.search("bellieve") == [4]
+    assert ix.search("cat") == []
+
+def test_short_terms_are_not_fuzzy():
+    ix = index({1: "cat", 2: "cart"})
+    assert ix.search("cot") == [] and ix.search("car") == [2]
+
+def test_every_term_must_match_and_scores_add_up():
+    ix = index({1: "red apple pie", 2: "red car", 3: "apple tree", 4: "redwood apples"})
+    assert ix.search("red apple") == [1, 4]
+    assert ix.search("apple red") == [1, 4]
+    assert ix.search("red apple car") == []
+
+def test_case_punctuation_and_unicode():
+    ix = index({1: "Café-Straße", 2: "CAFE_au_lait", 3: "Ärger"})
+    assert ix.search("straße") == [1] and ix.search("STRASSE") == [1] and ix.search("café") == [1, 2]
+    assert ix.search("cafe") == [2, 1] and ix.search("ärg") == [3]
+
+def test_file_name_is_searchable():
+    ix = TextIndex(); ix.set(1, "notes", "budget-2024.map"); ix.set(2, "budget")
+    assert ix.search("budget") == [2, 1] and ix.search("2024") == [1]
+
+def test_edit_replaces_old_words():
+    ix = index({1: "alpha beta", 2: "gamma"})
+    ix.search("alpha")
+    ix.set(1, "delta beta")
+    assert ix.search("alpha") == [] and ix.search("alph") == [] and ix.search("delta") == [1]
+    assert ix.search("beta") == [1] and "alpha" not in ix.postings and "alpha" not in ix.near.get("alpa", ())
+    ix.set(2, "alpha")
+    assert ix.search("alpha") == [2] and ix.search("alpa") == [2]
+
+def test_remove_drops_block_and_unshared_words():
+    ix = index({1: "orange juice", 2: "orange peel"})
+    ix.remove(1)
+    assert len(ix) == 1 and ix.search("orange") == [2] and ix.search("juice") == [] and ix.search("juic") == []
+    assert "juice" not in ix.postings and not any("juice" in ts for ts in ix.near.values())
+    ix.remove(2); ix.remove(2)
+    assert len(ix) == 0 and ix.search("orange") == [] and not ix.postings and not ix.near
+
+def test_limit_keeps_best_layers():
+    ix = index({i: "term" if i < 5 else "terms" for i in range(20)})
+    assert ix.search("term", limit=3) == [0, 1, 2]
+    assert ix.search("term", limit=7)[:5] == [0, 1, 2, 3, 4] and len(ix.search("term", limit=7)) == 7
+
+def test_matches_brute_force_through_edits_and_removals():
+    rng = random.Random(7)
+    vocab = ["map", "maps", "mapping", "node", "nodes", "notes", "block", "blocks", "black", "graph", "grape", "layer", "player", "étoile"]
+    docs, ix = {}, TextIndex()
+    for step in range(600):
+        uid = rng.randrange(60)
+        if rng.random() < 0.2: docs.pop(uid, None); ix.remove(uid)
+        else: docs[uid] = " ".join(rng.sample(vocab, rng.randint(1, 4))); ix.set(uid, docs[uid])
+        if step % 5 == 0:
+            q = " ".join(rng.choice(vocab + ["ma", "no", "blak", "graph", "playr", "etoile", "nodse"])[:rng.randint(2, 8)] for _ in range(rng.randint(1, 2)))
+            assert set(ix.search(q)) == brute(docs, q), q
+    assert len(ix) == len(docs)
+
+def test_vocab_rebuild_after_many_new_words():
+    ix = TextIndex(); ix.search("x")
+    for i in range(RESORT_AFTER * 3): ix.set(i, f"word{i:04d}")
+    assert ix.vocab() == sorted(ix.postings)
+    for i in range(RESORT_AFTER * 2): ix.remove(i)
+    assert ix.search("word00") == [] and ix.search("word0150")[0] == 150 and min(ix.search("word0")) == RESORT_AFTER * 2
+    assert ix.vocab() == sorted(ix.postings)
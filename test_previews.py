@@ -0,0 +1,91 @@
+import os
+import time
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt6.QtWidgets")
+
+import mapformat
+import mapimport
+import mindmap
+from PyQt6.QtGui import QColor, QImage
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def images(folder, n):
+    paths = []
+    for i in range(n):
+        img = QImage(32, 24, QImage.Format.Format_RGB32); img.fill(QColor(i * 10, 80, 160))
+        paths.append(str(folder / f"img{i}.png")); img.save(paths[-1])
+    return paths
+
+def settle(previews, timeout=10):
+    end = time.monotonic() + timeout
+    while previews.pending():
+        assert time.monotonic() < end; time.sleep(0.005)
+
+def counting(monkeypatch):
+    calls = []
+    def make_thumb(path, folder): calls.append(path); return real(path, folder)
+    real = mapimport.make_thumb; monkeypatch.setattr(mapimport, "make_thumb", make_thumb)
+    return calls
+
+
+def test_least_recently_shown_go_first(tmp_path):
+    a, b, c = images(tmp_path, 3); pv = mapimport.Previews(str(tmp_path / "thumbs"), max_thumbs=2)
+    for p in (a, b): pv.thumbnail(p); settle(pv)
+    pv.thumbnail(a); pv.thumbnail(c); settle(pv)
+    assert list(pv.thumbs) == [a, c]
+
+def test_pinned_thumbnails_are_kept_past_the_limit(tmp_path):
+    paths = images(tmp_path, 5); pv = mapimport.Previews(str(tmp_path / "thumbs"), max_thumbs=2)
+    pv.end_frame("scene", set(paths[:4]))
+    for p in paths[:4]: pv.thumbnail(p)
+    settle(pv); assert set(pv.thumbs) == set(paths[:4])
+    pv.end_frame("other", {paths[0]}); pv.end_frame("scene", set())
+    pv.thumbnail(paths[4]); settle(pv)
+    assert len(pv.thumbs) == 2 and paths[0] in pv.thumbs and paths[4] in pv.thumbs
+
+def test_more_visible_previews_than_the_cache_load_once(tmp_path, monkeypatch):
+    # 16 thumbnails on screen and room for 5: each is made once and the views stop repainting
+    paths = images(tmp_path, 16); calls = counting(monkeypatch)
+    pv = mapimport.Previews(str(tmp_path / "thumbs"), max_thumbs=5); monkeypatch.setattr(mindmap, "PREVIEWS", pv)
+    blocks = [{"x": 200 * (i % 4), "y": 130 * (i // 4), "txt": f"B{i}", "bc": "#4a90e2", "tc": "#ffffff", "ha": 1, "va": 1,
+               "id": str(i + 1), "w": 190, "h": 120, "f_path": p} for i, p in enumerate(paths)]
+    mapformat.save(str(tmp_path / "m.map"), {"bg": "#2b2b2b", "blocks": blocks, "lines": []})
+    win = mindmap.MainWindow(); win.resize(1200, 900); win.show(); win.load_from_path(str(tmp_path / "m.map"), False)
+    win.view.resetTransform(); win.view.centerOn(win.scene.content_rect().center()); app.processEvents()
+    for _ in range(20):
+        win.view.viewport().grab(); settle(pv); win.scene.poll_previews(); app.processEvents()
+    assert sorted(calls) == sorted(paths) and set(pv.thumbs) == set(paths)
+    win.view.scale(0.1, 0.1); win.view.viewport().grab()
+    assert not win.scene.pinned and not pv.shown
+    win.close()
+
+def test_every_watching_scene_hears_of_a_landing(tmp_path):
+    a, b = images(tmp_path, 2); pv = mapimport.Previews(str(tmp_path / "thumbs"))
+    pv.watch("one"); pv.watch("two"); pv.thumbnail(a); settle(pv)
+    assert pv.take_landed("one") == {a} and pv.take_landed("one") == set()
+    pv.unwatch("one"); pv.link_ok(b); settle(pv)
+    assert pv.take_landed("two") == {a, b} and pv.take_landed("one") == set() and pv.take_landed("three") == set()
+
+def test_two_windows_on_one_map_both_repaint(tmp_path, monkeypatch):
+    path, = images(tmp_path, 1)
+    pv = mapimport.Previews(str(tmp_path / "thumbs")); monkeypatch.setattr(mindmap, "PREVIEWS", pv)
+    asked = []  # the work runs once both windows have painted, so neither gets its answers on the first paint
+    monkeypatch.setattr(pv, "_submit", lambda key, fn, path: key in pv.busy or (pv.busy.add(key), asked.append((fn, path))))
+    block = {"x": 0, "y": 0, "txt": "B", "bc": "#4a90e2", "tc": "#ffffff", "ha": 1, "va": 1, "id": "1", "w": 190, "h": 120, "f_path": path}
+    mapformat.save(str(tmp_path / "m.map"), {"bg": "#2b2b2b", "blocks": [block], "lines": []})
+    wins = [mindmap.MainWindow() for _ in range(2)]
+    for win in wins:
+        win.resize(600, 400); win.show(); win.load_from_path(str(tmp_path / "m.map"), False)
+        win.view.centerOn(0, 0); win.view.viewport().grab()
+    assert len(asked) == 2
+    for fn, path in asked: fn(path)
+    repainted = []
+    for win in wins:
+        monkeypatch.setattr(win.scene, "update", lambda *a, win=win: repainted.append(win)); win.scene.poll_previews()
+    assert repainted == wins and not pv.landed and not any(win.scene.preview_timer.isActive() for win in wins)
+    for win in wins: win.close()